@@ -0,0 +1,70 @@
+import os
+import sys
+import glob
+import time
+import tracemalloc
+from listing_parser import parse_listing_page
+
+# Saved category pages; pass another directory to benchmark real pages, e.g. saved with:
+#   curl -o page.html https://www.businesslist.co.ke/category/restaurants
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURE_DIR = os.path.join(SCRIPT_DIR, "fixtures")
+ROUNDS = 20
+
+
+def load_fixtures(fixture_dir):
+    """Read every saved .html page from the fixture directory."""
+    pages = []
+    for path in sorted(glob.glob(os.path.join(fixture_dir, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            pages.append(f.read())
+    return pages
+
+
+def time_parse(pages, selective, rounds=ROUNDS):
+    """Return (seconds per page, listings found) for one parsing mode."""
+    found = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for html in pages:
+            listings, _ = parse_listing_page(html, "bench", selective=selective)
+            found += len(listings)
+    elapsed = time.perf_counter() - start
+    return elapsed / (rounds * len(pages)), found // rounds
+
+
+def peak_memory(pages, selective):
+    """Peak traced allocation (bytes) while parsing every page once."""
+    tracemalloc.start()
+    for html in pages:
+        parse_listing_page(html, "bench", selective=selective)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    fixture_dir = sys.argv[1] if len(sys.argv) > 1 else FIXTURE_DIR
+    pages = load_fixtures(fixture_dir)
+    if not pages:
+        print(f"❌ No .html fixtures found in {fixture_dir}")
+        return
+
+    print(f"📄 Benchmarking {len(pages)} saved pages x {ROUNDS} rounds...\n")
+
+    full_time, full_found = time_parse(pages, selective=False)
+    sel_time, sel_found = time_parse(pages, selective=True)
+    full_mem = peak_memory(pages, selective=False)
+    sel_mem = peak_memory(pages, selective=True)
+
+    if full_found != sel_found:
+        print(f"⚠️ Listing count mismatch: full={full_found} selective={sel_found}")
+
+    print(f"{'mode':<12}{'ms/page':>10}{'peak KiB':>12}{'listings':>10}")
+    print(f"{'full':<12}{full_time * 1000:>10.2f}{full_mem / 1024:>12.0f}{full_found:>10}")
+    print(f"{'selective':<12}{sel_time * 1000:>10.2f}{sel_mem / 1024:>12.0f}{sel_found:>10}")
+    print(f"\n🚀 Speedup: {full_time / sel_time:.1f}x, memory: {full_mem / max(sel_mem, 1):.1f}x less")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,37 @@
 import os
+import sys
 import csv
+import re
 import json
+import time
 import requests
 import threading
-from bs4 import BeautifulSoup
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from urllib.parse import urljoin
+from contextlib import contextmanager
 from tqdm import tqdm
+from http_cache import HttpCache
+from profile_parser import parse_business_profile
+from job_queue import JobQueue, wait_for_due
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.response_archive import ResponseArchive  # noqa: E402
+from common.record_encoder import encode_record  # noqa: E402
 
 # --- Paths ---
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(SCRIPT_DIR, "..", "..", "data")
-LOG_DIR = os.path.join(SCRIPT_DIR, "..", "..", "logs")
 INPUT_CSV = os.path.join(DATA_DIR, "businesslist_listings.csv")
 CSV_OUT = os.path.join(DATA_DIR, "businesslist_profiles.csv")
 JSONL_OUT = os.path.join(DATA_DIR, "businesslist_profiles.jsonl")
-FAILED_LOG = os.path.join(LOG_DIR, "failed_businesses.txt")
+# Parquet output is a dataset directory with one part file per run
+PARQUET_DIR = os.path.join(DATA_DIR, "businesslist_profiles.parquet")
+# One company_url per line for every saved record, so resuming doesn't
+# have to parse the whole output.
+INDEX_OUT = os.path.join(DATA_DIR, "businesslist_profiles.urls")
+JOBS_DB = os.path.join(DATA_DIR, "businesslist_jobs.db")
+CACHE_DIR = os.path.join(DATA_DIR, "http_cache")
+ARCHIVE_DIR = os.path.join(DATA_DIR, "raw_archive")
+PROFILE_JOB = "profile"
 
 # --- Constants ---
 BASE_URL = "https://www.businesslist.co.ke"
@@ -27,151 +43,184 @@ HEADERS = {
     )
 }
 MAX_WORKERS = 8
+RESUME = True  # skip companies already saved by a previous run
+OUTPUT_FORMATS = ("csv", "jsonl")  # any of "csv", "jsonl", "parquet"
 LOCK = threading.Lock()
+HTTP_CACHE = HttpCache(CACHE_DIR)  # set to None to always download in full
+ARCHIVE_RESPONSES = True  # keep raw pages for common/reparse_archive.py
+ARCHIVE = None  # opened by open_archive() when ARCHIVE_RESPONSES is set
+PARQUET_WRITER = None  # opened in main() when "parquet" is in OUTPUT_FORMATS
+FIELDNAMES = [
+    "company_name", "company_url", "categories", "tagline", "rating",
+    "photo_links", "address", "maps_url", "is_verified", "phone_numbers",
+    "website", "operating_hours", "extra_information", "company_description", "tags"
+]
 
 
 def fetch_html(url):
+    if HTTP_CACHE:
+        return HTTP_CACHE.get(url, headers=HEADERS, timeout=15)
     resp = requests.get(url, headers=HEADERS, timeout=15)
     resp.raise_for_status()
     return resp.text
 
 
-def parse_business_profile(html, company_url):
-    soup = BeautifulSoup(html, "html.parser")
-
-    def text_or_none(selector, attr="text"):
-        tag = soup.select_one(selector)
-        if tag:
-            return tag.text.strip() if attr == "text" else tag.get(attr)
-        return None
-
-    def extract_rating():
-        rating_tag = soup.find("span", class_="rate")
-        if rating_tag:
-            for c in rating_tag.get("class", []):
-                if c.startswith("rate_"):
-                    return int(c.split("_")[-1])
-        return None
-
-    def extract_photos():
-        photo_divs = soup.find_all("div", class_="photo_href", title="Company Photo")
-        return [
-            urljoin(BASE_URL, img["src"])
-            for div in photo_divs
-            for img in div.find_all("img")
-            if img.get("src")
-        ]
-
-    def extract_phone_numbers():
-        return [
-            a.get("href").replace("tel:", "")
-            for a in soup.find_all("a", href=True)
-            if a["href"].startswith("tel:")
-        ]
-
-    def extract_operating_hours():
-        hours_div = soup.find("div", id="open_hours")
-        if not hours_div:
-            return None
-        result = {}
-        for li in hours_div.find_all("li"):
-            day = li.find("small")
-            if day:
-                day_name = day.text.strip(": ")
-                time_range = li.get_text(strip=True).replace(day.text, "").strip()
-                result[day_name] = time_range
-        return result or None
-
-    def extract_extra_info():
-        extra = {}
-        for info in soup.select("div.extra_info div.info"):
-            label = info.find("div", class_="label")
-            value = label.find_next_sibling(text=True)
-            if label and value:
-                extra[label.text.strip().lower().replace(" ", "_")] = value.strip()
-        return extra or None
-
-    def extract_description():
-        desc_div = soup.find("div", class_="text desc")
-        if not desc_div:
-            return None
-        table = desc_div.find("table")
-        if table:
-            desc = {}
-            for row in table.find_all("tr"):
-                cells = row.find_all(["th", "td"])
-                if len(cells) == 2:
-                    desc[cells[0].text.strip()] = cells[1].text.strip()
-            return {"description": desc}
-        return {"description": desc_div.get_text(strip=True)}
-
-    def extract_tags():
-        tag_div = soup.find("div", class_="tags")
-        return [a.text.strip() for a in tag_div.find_all("a")] if tag_div else None
-
-    return {
-        "company_url": company_url,
-        "tagline": text_or_none("div.tagline"),
-        "rating": extract_rating(),
-        "photo_links": extract_photos() or None,
-        "company_name": text_or_none("div#company_name"),
-        "address": text_or_none("div#company_address"),
-        "maps_url": text_or_none("div.location_links a[rel='noopener']", "href"),
-        "is_verified": bool(soup.find("i", attrs={"aria-label": "verified"})),
-        "phone_numbers": extract_phone_numbers() or None,
-        "website": text_or_none("div.text.weblinks a"),
-        "operating_hours": extract_operating_hours(),
-        "extra_information": extract_extra_info(),
-        "company_description": extract_description(),
-        "tags": extract_tags(),
-    }
-
-
-def save_to_csv(data, fieldnames):
+def save_to_csv(row, fieldnames):
     with LOCK:
         file_exists = os.path.exists(CSV_OUT)
         with open(CSV_OUT, "a", newline="", encoding="utf-8") as f:
             writer = csv.DictWriter(f, fieldnames=fieldnames)
             if not file_exists:
                 writer.writeheader()
-            # Flatten nested fields to JSON strings
-            row = {k: json.dumps(v) if isinstance(v, (dict, list)) else v for k, v in data.items()}
             writer.writerow(row)
 
 
-def save_to_jsonl(data):
+def save_to_jsonl(line):
     with LOCK:
         with open(JSONL_OUT, "a", encoding="utf-8") as f:
-            json.dump(data, f)
-            f.write("\n")
+            f.write(line)
 
 
-def log_failure(name, url, error):
+def save_to_index(company_url):
     with LOCK:
-        with open(FAILED_LOG, "a", encoding="utf-8") as f:
-            f.write(f"{name},{url} -- {error}\n")
-
-
-def process_row(row, fieldnames):
+        with open(INDEX_OUT, "a", encoding="utf-8") as f:
+            f.write(company_url + "\n")
+
+
+def save_record(data, fieldnames):
+    """Write a profile to every configured output and mark it as saved."""
+    # Nested fields are serialized once and shared by the CSV row and JSONL line
+    line, row = encode_record(data)
+    if "csv" in OUTPUT_FORMATS:
+        save_to_csv(row, fieldnames)
+    if "jsonl" in OUTPUT_FORMATS:
+        save_to_jsonl(line)
+    if PARQUET_WRITER:
+        PARQUET_WRITER.write(data)
+    save_to_index(data["company_url"])
+
+
+COMPANY_URL_RE = re.compile(r'"company_url":\s*("(?:[^"\\]|\\.)*")')
+
+
+def rebuild_index():
+    """Recreate INDEX_OUT from the company_urls in JSONL_OUT."""
+    urls = []
+    with open(JSONL_OUT, encoding="utf-8") as f:
+        for line in f:
+            # company_url is the first key written, so a regex avoids a full json.loads
+            match = COMPANY_URL_RE.search(line)
+            if match:
+                urls.append(json.loads(match.group(1)))
+            elif line.strip():
+                try:
+                    urls.append(json.loads(line)["company_url"])
+                except (ValueError, KeyError):
+                    continue  # truncated last line from an interrupted run
+
+    with open(INDEX_OUT, "w", encoding="utf-8") as f:
+        f.writelines(url + "\n" for url in urls)
+    return urls
+
+
+def load_done_urls():
+    """Set of company_urls saved by previous runs."""
+    if os.path.exists(INDEX_OUT):
+        with open(INDEX_OUT, encoding="utf-8") as f:
+            return set(f.read().splitlines())
+    if not os.path.exists(JSONL_OUT):
+        return set()
+    print("🗂️  Building resume index from existing JSONL output...")
+    return set(rebuild_index())
+
+
+def process_row(queue, row, fieldnames):
     name = row["company_name"]
     url = row["company_url"]
+    payload = {"company_name": name, "categories": row.get("categories", [])}
+
+    if queue.is_done(PROFILE_JOB, url):
+        return True
 
     try:
         html = fetch_html(url)
+        if ARCHIVE:
+            ARCHIVE.record("businesslist", url, html, payload)
         data = parse_business_profile(html, url)
-        data.update({
-            "company_name": name,
-            "category": row.get("category", None)
-        })
+        data.update(payload)
 
-        save_to_csv(data, fieldnames)
-        save_to_jsonl(data)
+        save_record(data, fieldnames)
+        queue.mark_done(PROFILE_JOB, url)
         return True
     except Exception as e:
-        log_failure(name, url, str(e))
+        queue.mark_failed(PROFILE_JOB, url, e, payload)
         return False
 
 
+def open_archive():
+    """Open ARCHIVE under ARCHIVE_DIR if raw responses are being archived."""
+    global ARCHIVE
+    if ARCHIVE_RESPONSES and ARCHIVE is None:
+        ARCHIVE = ResponseArchive(ARCHIVE_DIR)
+
+
+@contextmanager
+def parquet_output():
+    """Open PARQUET_WRITER for the duration of a run if parquet output is enabled."""
+    global PARQUET_WRITER
+    if "parquet" not in OUTPUT_FORMATS:
+        yield
+        return
+
+    from common.parquet_writer import (
+        ParquetWriter, BUSINESSLIST_PROFILE_SCHEMA, businesslist_profile_row,
+    )
+    part = os.path.join(PARQUET_DIR, f"part-{time.strftime('%Y%m%d-%H%M%S')}.parquet")
+    PARQUET_WRITER = ParquetWriter(part, BUSINESSLIST_PROFILE_SCHEMA, transform=businesslist_profile_row)
+    try:
+        yield
+    finally:
+        PARQUET_WRITER.close()
+        print(f"🧱 Parquet: {PARQUET_WRITER.rows_written} rows written to {part}")
+        PARQUET_WRITER = None
+
+
+def dedupe_listings(rows):
+    """Collapse listings to one row per company_url, collecting every category it appears in."""
+    companies = {}
+    for row in rows:
+        url = row["company_url"]
+        company = companies.get(url)
+        if company is None:
+            company = companies[url] = {
+                "company_name": row["company_name"],
+                "company_url": url,
+                "categories": [],
+            }
+        category = row.get("category")
+        if category and category not in company["categories"]:
+            company["categories"].append(category)
+    return list(companies.values())
+
+
+def run_rows(queue, rows, fieldnames, desc):
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = [executor.submit(process_row, queue, row, fieldnames) for row in rows]
+        for _ in tqdm(as_completed(futures), total=len(futures), desc=desc, unit="company"):
+            pass
+
+
+def retry_failed_profiles(queue, fieldnames):
+    """Re-run failed profiles from the job queue, waiting out each job's backoff."""
+    while wait_for_due(queue, PROFILE_JOB):
+        rows = [
+            {**job["payload"], "company_url": job["key"]}
+            for job in queue.due_jobs(PROFILE_JOB)
+        ]
+        if rows:
+            run_rows(queue, rows, fieldnames, "🔁 Retrying")
+
+
 def main():
     with open(INPUT_CSV, newline="", encoding="utf-8") as f:
         reader = list(csv.DictReader(f))
@@ -180,24 +229,35 @@ def main():
         print("❌ No listings found.")
         return
 
-    print(f"📄 Loaded {len(reader)} listings. Starting enrichment...")
+    companies = dedupe_listings(reader)
+    print(f"📄 Loaded {len(reader)} listings ({len(companies)} unique companies).")
 
-    fieldnames = [
-        "company_name", "company_url", "category", "tagline", "rating",
-        "photo_links", "address", "maps_url", "is_verified", "phone_numbers",
-        "website", "operating_hours", "extra_information", "company_description", "tags"
-    ]
+    if RESUME:
+        done_urls = load_done_urls()
+        if done_urls:
+            companies = [c for c in companies if c["company_url"] not in done_urls]
+            print(f"⏩ Resuming: {len(done_urls)} companies already saved, {len(companies)} left.")
 
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = [executor.submit(process_row, row, fieldnames) for row in reader]
-        for _ in tqdm(as_completed(futures), total=len(futures), desc="🔄 Enriching", unit="company"):
-            pass
+    print("Starting enrichment...")
+    open_archive()
+
+    with JobQueue(JOBS_DB) as queue, parquet_output():
+        # Done jobs from earlier runs would skip every company; resuming is
+        # handled above from the saved output instead
+        queue.reset(PROFILE_JOB)
+        run_rows(queue, companies, FIELDNAMES, "🔄 Enriching")
+        retry_failed_profiles(queue, FIELDNAMES)
+        counts = queue.counts(PROFILE_JOB)
 
     print("\n✅ Done. Results saved to:")
-    print(f"📦 CSV: {CSV_OUT}")
-    print(f"📘 JSONL: {JSONL_OUT}")
-    if os.path.exists(FAILED_LOG):
-        print(f"⚠️  Failed entries logged in: {FAILED_LOG}")
+    if "csv" in OUTPUT_FORMATS:
+        print(f"📦 CSV: {CSV_OUT}")
+    if "jsonl" in OUTPUT_FORMATS:
+        print(f"📘 JSONL: {JSONL_OUT}")
+    if HTTP_CACHE:
+        print(f"🗄️  {HTTP_CACHE.report()}")
+    if counts.get("dead"):
+        print(f"⚠️  {counts['dead']} profiles still failing after retries. Job queue: {JOBS_DB}")
 
 
 if __name__ == "__main__":
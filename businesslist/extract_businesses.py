@@ -1,22 +1,30 @@
 import os
 import csv
 import requests
-from bs4 import BeautifulSoup
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import threading
 from tqdm import tqdm
 import time
+from listing_parser import parse_listing_page, make_listing_soup, extract_listings, find_last_page, page_url_like
+from listing_parser import find_next_page_url as find_next_page_link
+from http_cache import HttpCache
+from job_queue import JobQueue, DONE, wait_for_due
 
 # --- Constants ---
 BASE_URL = "https://www.businesslist.co.ke"
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(SCRIPT_DIR, "..", "..", "data")
-LOG_DIR = os.path.join(SCRIPT_DIR, "..", "..", "logs")
 INPUT_CSV = os.path.join(DATA_DIR, "businesslist_categories.csv")
 OUTPUT_CSV = os.path.join(DATA_DIR, "businesslist_listings.csv")
-FAILED_LOG = os.path.join(LOG_DIR, "failed_categories.txt")
+JOBS_DB = os.path.join(DATA_DIR, "businesslist_jobs.db")
+CACHE_DIR = os.path.join(DATA_DIR, "http_cache")
+PAGE_JOB = "category_page"
 
 MAX_WORKERS = 6
+# False starts a new run (done pages in the job queue are forgotten first);
+# True continues an interrupted run, skipping pages it already scraped
+RESUME = False
+SPLIT_PAGES = 25  # categories longer than this are split into page-range jobs
 HEADERS = {
     "User-Agent": (
         "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
@@ -25,11 +33,14 @@ HEADERS = {
     )
 }
 LOCK = threading.Lock()
+HTTP_CACHE = HttpCache(CACHE_DIR)  # set to None to always download in full
 
 
 # --- Core Functions ---
 def fetch_page(url):
-    """Fetch page content with headers."""
+    """Fetch page content with headers, revalidating against the HTTP cache."""
+    if HTTP_CACHE:
+        return HTTP_CACHE.get(url, headers=HEADERS, timeout=10)
     response = requests.get(url, headers=HEADERS, timeout=10)
     response.raise_for_status()
     return response.text
@@ -37,33 +48,53 @@ def fetch_page(url):
 
 def extract_listings_from_page(html, category):
     """Extract business name and URL from a category page."""
-    soup = BeautifulSoup(html, "html.parser")
-    listings = []
-
-    for div in soup.find_all("div", class_="company_header"):
-        a_tag = div.find("h3").find("a")
-        if not a_tag or not a_tag.get("href"):
-            continue
-
-        name = a_tag.text.strip()
-        url = BASE_URL + a_tag["href"]
-        listings.append((name, url, category))
-
+    listings, _ = parse_listing_page(html, category)
     return listings
 
 
 def find_next_page_url(html):
     """Get next page URL if exists, else None."""
-    soup = BeautifulSoup(html, "html.parser")
-    next_link = soup.find("a", class_="pages_arrow", rel="next")
-    return BASE_URL + next_link["href"] if next_link and next_link.get("href") else None
+    _, next_url = parse_listing_page(html, None)
+    return next_url
 
 
 def read_categories(csv_file):
-    """Read categories from CSV and return list of (url, category_name)."""
+    """Read categories from CSV and return list of (url, category_name, business_count)."""
     with open(csv_file, newline="", encoding="utf-8") as f:
         reader = csv.DictReader(f)
-        return [(row["url"], row["category"]) for row in reader]
+        return [
+            (row["url"], row["category"], int(row.get("business_count") or 0))
+            for row in reader
+        ]
+
+
+def plan_category_jobs(categories):
+    """
+    One job per category, largest business_count first. A job that finds
+    more than SPLIT_PAGES pages in its pager hands the rest back as
+    page-range jobs (see split_category).
+    """
+    ordered = sorted(categories, key=lambda c: c[2], reverse=True)
+    return [{"url": url, "category": name, "page": 1, "end_page": None} for url, name, _ in ordered]
+
+
+def split_category(category_name, last_page, last_url):
+    """
+    Page-range jobs for pages 2..last_page of a category, as read from its
+    first page's pager. The last range is open-ended in case pages were
+    added since.
+    """
+    jobs = []
+    for start in range(2, last_page + 1, SPLIT_PAGES):
+        end = start + SPLIT_PAGES - 1
+        jobs.append({
+            "url": page_url_like(last_url, start),
+            "category": category_name,
+            "page": start,
+            "end_page": end if end < last_page else None,
+            "estimated_pages": min(end, last_page) - start + 1,
+        })
+    return jobs
 
 
 def save_listings_incrementally(listings, filename):
@@ -78,65 +109,149 @@ def save_listings_incrementally(listings, filename):
         writer.writerows(listings)
 
 
-def log_failed_category(category_name, category_url, error_msg):
-    """Log failed categories to a separate file."""
-    with LOCK:
-        with open(FAILED_LOG, mode="a", encoding="utf-8") as f:
-            f.write(f"{category_name},{category_url} -- {error_msg}\n")
-
-
 # --- Main Worker ---
-def scrape_category(category_url, category_name):
+def is_not_found(error):
+    response = getattr(error, "response", None)
+    return response is not None and response.status_code == 404
+
+
+def scrape_category(queue, category_url, category_name, page=1, end_page=None, progress=None):
+    """
+    Walk a category's pages from `page` up to `end_page` (or the last page),
+    skipping pages the job queue already has as done. A 404 or a page
+    without listings ends the walk. Returns (listings scraped, follow-up
+    jobs); a long category's first page hands its remaining pages back as
+    page-range jobs instead of walking them itself.
+    """
     current_url = category_url
     total = 0
-
-    while current_url:
-        try:
-            print(f"  Scraping: {current_url}")
-            html = fetch_page(current_url)
-            listings = extract_listings_from_page(html, category_name)
+    follow_up = []
+
+    while current_url and (end_page is None or page <= end_page):
+        job = queue.get(PAGE_JOB, current_url)
+        if job and job["status"] == DONE:
+            done = job["payload"]
+        else:
+            payload = {"category": category_name, "page": page, "end_page": end_page}
+            try:
+                print(f"  Scraping: {current_url}")
+                html = fetch_page(current_url)
+            except requests.RequestException as e:
+                if is_not_found(e):
+                    # Past the real last page, e.g. the category shrank since it was split
+                    queue.mark_done(PAGE_JOB, current_url, {**payload, "next_url": None})
+                    print(f"  ⏹️ Not found, end of category: {current_url}")
+                    break
+                queue.mark_failed(PAGE_JOB, current_url, e, payload)
+                print(f"  ❌ Failed: {current_url} -- {e}")
+                break
+
+            soup = make_listing_soup(html)
+            listings = extract_listings(soup, category_name)
+            next_url = find_next_page_link(soup) if listings else None
+            done = {**payload, "next_url": next_url}
+            if page == 1:
+                done["last_page"], done["last_url"] = find_last_page(soup)
             total += len(listings)
 
             if listings:
                 with LOCK:
                     save_listings_incrementally(listings, OUTPUT_CSV)
 
-            current_url = find_next_page_url(html)
+            queue.mark_done(PAGE_JOB, current_url, done)
             time.sleep(0.5)  # optional polite delay
 
-        except requests.RequestException as e:
-            log_failed_category(category_name, current_url, str(e))
-            print(f"  ❌ Failed: {current_url} -- {e}")
+        current_url = done.get("next_url")
+        if progress:
+            progress.update(1)
+        if page == 1 and end_page is None and (done.get("last_page") or 0) > SPLIT_PAGES:
+            follow_up = split_category(category_name, done["last_page"], done["last_url"])
             break
+        page += 1
 
-    return total
+    return total, follow_up
+
+
+def run_category_jobs(queue, jobs, desc):
+    """Scrape page-range jobs concurrently, including the ones they split off, and return the listing count."""
+    total_listings = 0
+
+    with (
+        ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor,
+        tqdm(total=sum(job.get("estimated_pages", 1) for job in jobs), desc=desc, unit="page") as progress,
+    ):
+        futures = {}
+
+        def submit(job):
+            future = executor.submit(
+                scrape_category, queue, job["url"], job["category"],
+                job.get("page", 1), job.get("end_page"), progress,
+            )
+            futures[future] = job
+
+        for job in jobs:
+            submit(job)
+
+        while futures:
+            finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in finished:
+                job = futures.pop(future)
+                try:
+                    listings, follow_up = future.result()
+                except Exception as e:
+                    print(f"  ❌ Unexpected error in {job['category']}: {e}")
+                    queue.mark_failed(PAGE_JOB, job["url"], e, {
+                        "category": job["category"],
+                        "page": job.get("page", 1),
+                        "end_page": job.get("end_page"),
+                    })
+                    continue
+
+                total_listings += listings
+                if follow_up:
+                    progress.total += sum(extra["estimated_pages"] for extra in follow_up)
+                    progress.refresh()
+                for extra in follow_up:
+                    submit(extra)
+
+    return total_listings
+
+
+def retry_failed_pages(queue):
+    """Re-run failed pages from the job queue, waiting out each job's backoff."""
+    total_listings = 0
+    while wait_for_due(queue, PAGE_JOB):
+        jobs = [{"url": job["key"], **job["payload"]} for job in queue.due_jobs(PAGE_JOB)]
+        if jobs:
+            total_listings += run_category_jobs(queue, jobs, "🔁 Retrying")
+    return total_listings
 
 
 # --- Orchestrator ---
 def scrape_all_businesses():
     categories = read_categories(INPUT_CSV)
-    print(f"\n📦 Found {len(categories)} categories. Starting scraping with {MAX_WORKERS} threads...\n")
+    jobs = plan_category_jobs(categories)
+    expected = sum(count for _, _, count in categories)
+    print(
+        f"\n📦 Found {len(categories)} categories (~{expected} businesses). "
+        f"Starting scraping with {MAX_WORKERS} threads...\n"
+    )
 
-    total_listings = 0
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        futures = {
-            executor.submit(scrape_category, url, name): name
-            for url, name in categories
-        }
-
-        for future in tqdm(as_completed(futures), total=len(futures), desc="🔄 Progress", unit="cat"):
-            category_name = futures[future]
-            try:
-                result = future.result()
-                total_listings += result
-            except Exception as e:
-                print(f"  ❌ Unexpected error in {category_name}: {e}")
-                log_failed_category(category_name, "unknown", str(e))
+    with JobQueue(JOBS_DB) as queue:
+        if RESUME:
+            print(f"⏩ Resuming: {queue.counts(PAGE_JOB).get(DONE, 0)} pages already done.")
+        else:
+            queue.reset(PAGE_JOB)
+        total_listings = run_category_jobs(queue, jobs, "🔄 Progress")
+        total_listings += retry_failed_pages(queue)
+        counts = queue.counts(PAGE_JOB)
 
-    print(f"\n✅ Done! Total listings scraped: {total_listings}")
+    print(f"\n✅ Done! Total listings scraped: {total_listings} of ~{expected} expected")
     print(f"📄 Results saved to: {OUTPUT_CSV}")
-    if os.path.exists(FAILED_LOG):
-        print(f"⚠️ Some categories failed. See log: {FAILED_LOG}")
+    if HTTP_CACHE:
+        print(f"🗄️  {HTTP_CACHE.report()}")
+    if counts.get("dead"):
+        print(f"⚠️ {counts['dead']} pages still failing after retries. Job queue: {JOBS_DB}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,159 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+import requests
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3  # 2 GiB of cached bodies
+
+
+class HttpCache:
+    """
+    On-disk cache for GET requests that revalidates with ETag/Last-Modified.
+    Bodies are stored one file per URL; an SQLite index tracks validators,
+    sizes and last access so the least recently used entries are evicted
+    once the cache grows past max_bytes.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "uncacheable": 0, "evicted": 0}
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self.conn = sqlite3.connect(os.path.join(cache_dir, "index.db"), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                encoding TEXT,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_access)")
+        self.conn.commit()
+        self.total_bytes = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def _body_path(self, url):
+        digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], digest)
+
+    def _lookup(self, url):
+        with self.lock:
+            return self.conn.execute(
+                "SELECT etag, last_modified, encoding FROM entries WHERE url = ?", (url,)
+            ).fetchone()
+
+    def _read_body(self, url):
+        with open(self._body_path(url), "rb") as f:
+            return f.read()
+
+    def _touch(self, url):
+        with self.lock:
+            self.conn.execute("UPDATE entries SET last_access = ? WHERE url = ?", (time.time(), url))
+            self.conn.commit()
+
+    def _store(self, url, resp):
+        path = self._body_path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(resp.content)
+        os.replace(tmp_path, path)
+
+        with self.lock:
+            old = self.conn.execute("SELECT size FROM entries WHERE url = ?", (url,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries (url, etag, last_modified, encoding, size, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    url,
+                    resp.headers.get("ETag"),
+                    resp.headers.get("Last-Modified"),
+                    resp.encoding,
+                    len(resp.content),
+                    time.time(),
+                ),
+            )
+            self.total_bytes += len(resp.content) - (old[0] if old else 0)
+            self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        """Drop least recently used entries until under max_bytes. Caller holds the lock."""
+        while self.total_bytes > self.max_bytes:
+            rows = self.conn.execute(
+                "SELECT url, size FROM entries ORDER BY last_access LIMIT 100"
+            ).fetchall()
+            if not rows:
+                break
+            for url, size in rows:
+                self.conn.execute("DELETE FROM entries WHERE url = ?", (url,))
+                try:
+                    os.remove(self._body_path(url))
+                except FileNotFoundError:
+                    pass
+                self.total_bytes -= size
+                self.stats["evicted"] += 1
+                if self.total_bytes <= self.max_bytes:
+                    break
+
+    def get(self, url, headers=None, timeout=15, session=requests):
+        """GET `url` and return its text, revalidating any cached copy first."""
+        request_headers = dict(headers or {})
+        cached = self._lookup(url)
+        if cached:
+            etag, last_modified, _ = cached
+            if etag:
+                request_headers["If-None-Match"] = etag
+            if last_modified:
+                request_headers["If-Modified-Since"] = last_modified
+
+        resp = session.get(url, headers=request_headers, timeout=timeout)
+
+        if resp.status_code == 304 and cached:
+            try:
+                body = self._read_body(url)
+            except FileNotFoundError:
+                # Index and body got out of sync; fetch unconditionally instead.
+                with self.lock:
+                    self.conn.execute("DELETE FROM entries WHERE url = ?", (url,))
+                    self.conn.commit()
+                return self.get(url, headers, timeout, session)
+            self._touch(url)
+            with self.lock:
+                self.stats["hits"] += 1
+            return body.decode(cached[2] or "utf-8", errors="replace")
+
+        resp.raise_for_status()
+        if resp.headers.get("ETag") or resp.headers.get("Last-Modified"):
+            self._store(url, resp)
+            key = "misses"
+        else:
+            key = "uncacheable"
+        with self.lock:
+            self.stats[key] += 1
+        return resp.text
+
+    def hit_rate(self):
+        total = self.stats["hits"] + self.stats["misses"] + self.stats["uncacheable"]
+        return self.stats["hits"] / total if total else 0.0
+
+    def report(self):
+        return (
+            f"HTTP cache: {self.hit_rate():.1%} hit rate "
+            f"({self.stats['hits']} not modified, {self.stats['misses']} downloaded, "
+            f"{self.stats['uncacheable']} uncacheable, {self.stats['evicted']} evicted), "
+            f"{self.total_bytes / 1024 ** 2:.1f} MiB on disk"
+        )
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,195 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+# Job states
+PENDING = "pending"
+DONE = "done"
+DEAD = "dead"  # ran out of attempts; revive with requeue_dead()
+
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 30  # seconds; doubles after each failed attempt
+BACKOFF_MAX = 3600
+
+
+class JobQueue:
+    """
+    Durable SQLite queue of scrape jobs keyed by (kind, key).
+    Each job keeps a JSON payload, status, attempt count, last error
+    and the earliest time it may be retried.
+
+    Done jobs never expire on their own: they are what lets an interrupted
+    run resume where it stopped. A new run calls reset() first so every job
+    is fetched again; failed and dead jobs are kept so the retry scripts
+    can still see them.
+    """
+
+    def __init__(self, path, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                next_eligible_at REAL NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (kind, key)
+            )
+            """
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_due ON jobs (kind, status, next_eligible_at)"
+        )
+        self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def enqueue(self, kind, key, payload=None):
+        """Add a pending job; existing jobs (including finished ones) are left as is."""
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO jobs (kind, key, payload, status, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (kind, key, json.dumps(payload or {}), PENDING, time.time()),
+            )
+            self.conn.commit()
+
+    def get(self, kind, key):
+        """Return the job as a dict, or None if it was never queued."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT key, payload, status, attempts, last_error, next_eligible_at "
+                "FROM jobs WHERE kind = ? AND key = ?",
+                (kind, key),
+            ).fetchone()
+        return self._to_job(row) if row else None
+
+    def is_done(self, kind, key):
+        job = self.get(kind, key)
+        return bool(job and job["status"] == DONE)
+
+    def mark_done(self, kind, key, payload=None):
+        """Record success, optionally replacing the stored payload."""
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO jobs (kind, key, payload, status, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (kind, key) DO UPDATE SET status = excluded.status, "
+                "payload = CASE WHEN ? THEN excluded.payload ELSE jobs.payload END, "
+                "last_error = NULL, updated_at = excluded.updated_at",
+                (kind, key, json.dumps(payload or {}), DONE, time.time(), payload is not None),
+            )
+            self.conn.commit()
+
+    def mark_failed(self, kind, key, error, payload=None):
+        """Record a failed attempt and schedule the next one with exponential backoff."""
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO jobs (kind, key, payload, status, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (kind, key, json.dumps(payload or {}), PENDING, now),
+            )
+            attempts = self.conn.execute(
+                "SELECT attempts FROM jobs WHERE kind = ? AND key = ?", (kind, key)
+            ).fetchone()[0] + 1
+            status = DEAD if attempts >= self.max_attempts else PENDING
+            delay = min(BACKOFF_BASE * (2 ** (attempts - 1)), BACKOFF_MAX)
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, attempts = ?, last_error = ?, "
+                "next_eligible_at = ?, updated_at = ? WHERE kind = ? AND key = ?",
+                (status, attempts, str(error), now + delay, now, kind, key),
+            )
+            self.conn.commit()
+        return status
+
+    def due_jobs(self, kind, limit=None):
+        """Pending jobs of this kind whose backoff has expired."""
+        sql = (
+            "SELECT key, payload, status, attempts, last_error, next_eligible_at FROM jobs "
+            "WHERE kind = ? AND status = ? AND next_eligible_at <= ? ORDER BY next_eligible_at"
+        )
+        params = [kind, PENDING, time.time()]
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [self._to_job(row) for row in rows]
+
+    def next_due_at(self, kind):
+        """Earliest retry time among pending jobs, or None if nothing is pending."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT MIN(next_eligible_at) FROM jobs WHERE kind = ? AND status = ?",
+                (kind, PENDING),
+            ).fetchone()
+        return row[0]
+
+    def counts(self, kind):
+        """Number of jobs per status."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT status, COUNT(*) FROM jobs WHERE kind = ? GROUP BY status", (kind,)
+            ).fetchall()
+        return dict(rows)
+
+    def reset(self, kind):
+        """Forget the done jobs of this kind, e.g. at the start of a new run. Returns how many."""
+        with self.lock:
+            cur = self.conn.execute("DELETE FROM jobs WHERE kind = ? AND status = ?", (kind, DONE))
+            self.conn.commit()
+        return cur.rowcount
+
+    def requeue_dead(self, kind):
+        """Give jobs that exhausted their attempts a fresh set of retries."""
+        with self.lock:
+            cur = self.conn.execute(
+                "UPDATE jobs SET status = ?, attempts = 0, next_eligible_at = 0, updated_at = ? "
+                "WHERE kind = ? AND status = ?",
+                (PENDING, time.time(), kind, DEAD),
+            )
+            self.conn.commit()
+        return cur.rowcount
+
+    @staticmethod
+    def _to_job(row):
+        key, payload, status, attempts, last_error, next_eligible_at = row
+        return {
+            "key": key,
+            "payload": json.loads(payload),
+            "status": status,
+            "attempts": attempts,
+            "last_error": last_error,
+            "next_eligible_at": next_eligible_at,
+        }
+
+
+def wait_for_due(queue, kind):
+    """Sleep until the next pending job of this kind is eligible. Returns False if none remain."""
+    next_at = queue.next_due_at(kind)
+    if next_at is None:
+        return False
+    delay = next_at - time.time()
+    if delay > 0:
+        print(f"⏳ Waiting {delay:.0f}s for the next {kind} retry...")
+        time.sleep(delay)
+    return True
@@ -0,0 +1,68 @@
+import re
+from bs4 import BeautifulSoup, SoupStrainer
+
+BASE_URL = "https://www.businesslist.co.ke"
+
+# Only the listing headers and the pager links are read from a category page,
+# so the parser is told to build those subtrees and drop everything else.
+LISTING_STRAINER = SoupStrainer(class_=["company_header", "pages_arrow", "pages_no"])
+PAGE_NUMBER_RE = re.compile(r"\d+(?=/?$)")
+
+# Set to False to fall back to building the full document tree.
+SELECTIVE_PARSING = True
+
+
+def make_listing_soup(html, selective=None):
+    """Parse a category page, keeping only listing headers and pager links."""
+    if selective is None:
+        selective = SELECTIVE_PARSING
+    if selective:
+        return BeautifulSoup(html, "html.parser", parse_only=LISTING_STRAINER)
+    return BeautifulSoup(html, "html.parser")
+
+
+def extract_listings(soup, category):
+    """Extract (name, url, category) tuples from a parsed category page."""
+    listings = []
+
+    for div in soup.find_all("div", class_="company_header"):
+        h3 = div.find("h3")
+        a_tag = h3.find("a") if h3 else None
+        if not a_tag or not a_tag.get("href"):
+            continue
+
+        name = a_tag.text.strip()
+        url = BASE_URL + a_tag["href"]
+        listings.append((name, url, category))
+
+    return listings
+
+
+def find_next_page_url(soup):
+    """Get next page URL from a parsed category page if it exists, else None."""
+    next_link = soup.find("a", class_="pages_arrow", rel="next")
+    return BASE_URL + next_link["href"] if next_link and next_link.get("href") else None
+
+
+def find_last_page(soup):
+    """
+    Highest page linked from the pager and its URL, as (number, url), or
+    (None, None) when the page links no other numbered pages.
+    """
+    last, last_url = None, None
+    for a_tag in soup.find_all("a", class_="pages_no", href=True):
+        text = a_tag.get_text(strip=True)
+        if text.isdigit() and (last is None or int(text) > last):
+            last, last_url = int(text), BASE_URL + a_tag["href"]
+    return last, last_url
+
+
+def page_url_like(last_url, page):
+    """URL of another page of a category, following the layout of a pager link."""
+    return PAGE_NUMBER_RE.sub(str(page), last_url, count=1)
+
+
+def parse_listing_page(html, category, selective=None):
+    """Parse a category page once and return (listings, next_page_url)."""
+    soup = make_listing_soup(html, selective)
+    return extract_listings(soup, category), find_next_page_url(soup)
@@ -0,0 +1,95 @@
+from bs4 import BeautifulSoup
+from urllib.parse import urljoin
+
+BASE_URL = "https://www.businesslist.co.ke"
+
+
+def parse_business_profile(html, company_url):
+    soup = BeautifulSoup(html, "html.parser")
+
+    def text_or_none(selector, attr="text"):
+        tag = soup.select_one(selector)
+        if tag:
+            return tag.text.strip() if attr == "text" else tag.get(attr)
+        return None
+
+    def extract_rating():
+        rating_tag = soup.find("span", class_="rate")
+        if rating_tag:
+            for c in rating_tag.get("class", []):
+                if c.startswith("rate_"):
+                    return int(c.split("_")[-1])
+        return None
+
+    def extract_photos():
+        photo_divs = soup.find_all("div", class_="photo_href", title="Company Photo")
+        return [
+            urljoin(BASE_URL, img["src"])
+            for div in photo_divs
+            for img in div.find_all("img")
+            if img.get("src")
+        ]
+
+    def extract_phone_numbers():
+        return [
+            a.get("href").replace("tel:", "")
+            for a in soup.find_all("a", href=True)
+            if a["href"].startswith("tel:")
+        ]
+
+    def extract_operating_hours():
+        hours_div = soup.find("div", id="open_hours")
+        if not hours_div:
+            return None
+        result = {}
+        for li in hours_div.find_all("li"):
+            day = li.find("small")
+            if day:
+                day_name = day.text.strip(": ")
+                time_range = li.get_text(strip=True).replace(day.text, "").strip()
+                result[day_name] = time_range
+        return result or None
+
+    def extract_extra_info():
+        extra = {}
+        for info in soup.select("div.extra_info div.info"):
+            label = info.find("div", class_="label")
+            value = label.find_next_sibling(text=True)
+            if label and value:
+                extra[label.text.strip().lower().replace(" ", "_")] = value.strip()
+        return extra or None
+
+    def extract_description():
+        desc_div = soup.find("div", class_="text desc")
+        if not desc_div:
+            return None
+        table = desc_div.find("table")
+        if table:
+            desc = {}
+            for row in table.find_all("tr"):
+                cells = row.find_all(["th", "td"])
+                if len(cells) == 2:
+                    desc[cells[0].text.strip()] = cells[1].text.strip()
+            return {"description": desc}
+        return {"description": desc_div.get_text(strip=True)}
+
+    def extract_tags():
+        tag_div = soup.find("div", class_="tags")
+        return [a.text.strip() for a in tag_div.find_all("a")] if tag_div else None
+
+    return {
+        "company_url": company_url,
+        "tagline": text_or_none("div.tagline"),
+        "rating": extract_rating(),
+        "photo_links": extract_photos() or None,
+        "company_name": text_or_none("div#company_name"),
+        "address": text_or_none("div#company_address"),
+        "maps_url": text_or_none("div.location_links a[rel='noopener']", "href"),
+        "is_verified": bool(soup.find("i", attrs={"aria-label": "verified"})),
+        "phone_numbers": extract_phone_numbers() or None,
+        "website": text_or_none("div.text.weblinks a"),
+        "operating_hours": extract_operating_hours(),
+        "extra_information": extract_extra_info(),
+        "company_description": extract_description(),
+        "tags": extract_tags(),
+    }
@@ -0,0 +1,43 @@
+import os
+import glob
+
+import pytest
+from bs4 import BeautifulSoup
+
+from listing_parser import BASE_URL, parse_listing_page
+
+FIXTURES = sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "*.html")))
+
+
+def legacy_parse(html, category):
+    """The full-soup parsing extract_businesses used before listing_parser."""
+    soup = BeautifulSoup(html, "html.parser")
+    listings = []
+    for div in soup.find_all("div", class_="company_header"):
+        a_tag = div.find("h3").find("a")
+        if not a_tag or not a_tag.get("href"):
+            continue
+        listings.append((a_tag.text.strip(), BASE_URL + a_tag["href"], category))
+
+    soup = BeautifulSoup(html, "html.parser")
+    next_link = soup.find("a", class_="pages_arrow", rel="next")
+    next_url = BASE_URL + next_link["href"] if next_link and next_link.get("href") else None
+    return listings, next_url
+
+
+def read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def test_fixtures_present():
+    assert FIXTURES
+
+
+@pytest.mark.parametrize("path", FIXTURES, ids=os.path.basename)
+@pytest.mark.parametrize("selective", [True, False])
+def test_matches_legacy_parse(path, selective):
+    html = read(path)
+    expected = legacy_parse(html, "Fixtures")
+    assert expected[0]
+    assert parse_listing_page(html, "Fixtures", selective=selective) == expected
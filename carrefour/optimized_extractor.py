@@ -1,4 +1,5 @@
 import os
+import sys
 import json
 import random
 import asyncio
@@ -9,6 +10,10 @@ from playwright.async_api import (
     async_playwright,
     TimeoutError as PlaywrightTimeoutError,
 )
+from product_parser import find_product_data, extract_product_info
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.response_archive import ResponseArchive  # noqa: E402
 
 # --- Load Environment Variables ---
 load_dotenv() 
@@ -17,21 +22,10 @@ load_dotenv()
 MAX_CONCURRENT_TASKS = 3
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/125.0.0.0 Safari/537.36"
 STEALTH_JS_PATH = "stealth.min.js"
+ARCHIVE = ResponseArchive("raw_archive")  # __NEXT_DATA__ payloads for re-parsing; None to disable
 
 
 # --- Helper Functions ---
-def get_nested_value(data, keys, default=None):
-    """Safely access nested dictionary keys."""
-    for key in keys:
-        if isinstance(data, dict):
-            data = data.get(key)
-        elif isinstance(data, list) and len(data) > 0:
-            data = data[0]
-        else:
-            return default
-    return data
-
-
 async def human_like_delay(min_sec=0.5, max_sec=1.5):
     """Wait for a random duration to mimic human behavior."""
     await asyncio.sleep(random.uniform(min_sec, max_sec))
@@ -58,13 +52,10 @@ async def scrape_product(page, url, retries=3):
                 print(f"ERROR: __NEXT_DATA__ not found on {url}")
                 continue  # Go to the next retry attempt
 
-            data = json.loads(content)
-            product_data = get_nested_value(
-                data, ["props", "pageProps", "product"]
-            ) or get_nested_value(
-                data,
-                ["props", "initialProps", "pageProps", "initialData", "products", 0],
-            )
+            if ARCHIVE:
+                ARCHIVE.record("carrefour", url, content)
+
+            product_data = find_product_data(json.loads(content))
 
             if not product_data:
                 print(
@@ -72,34 +63,7 @@ async def scrape_product(page, url, retries=3):
                 )
                 return None  # If structure is missing, retrying won't help
 
-            product_info = {
-                "id": product_data.get("id"),
-                "ean": get_nested_value(product_data, ["attributes", "ean"]),
-                "sku": get_nested_value(
-                    product_data, ["offers", 0, "stores", 0, "storeData", "sku"]
-                ),
-                "title": product_data.get("title"),
-                "brandName": get_nested_value(
-                    product_data, ["attributes", "brandName"]
-                ),
-                "brandCode": get_nested_value(
-                    product_data, ["attributes", "brandCode"]
-                ),
-                "description": get_nested_value(
-                    product_data, ["attributes", "description"]
-                ),
-                "price": get_nested_value(
-                    product_data, ["offers", 0, "stores", 0, "price", "value"]
-                ),
-                "currency": get_nested_value(
-                    product_data, ["offers", 0, "stores", 0, "price", "currencyISO"]
-                ),
-                "stockStatus": get_nested_value(
-                    product_data,
-                    ["offers", 0, "stores", 0, "quantity", "stockIndicator", "status"],
-                ),
-                "url": url,
-            }
+            product_info = extract_product_info(product_data, url)
             print(f"SUCCESS: Scraped {product_info['title']}")
             return product_info  # Success, exit the retry loop
 
@@ -0,0 +1,61 @@
+import json
+
+
+def get_nested_value(data, keys, default=None):
+    """Safely access nested dictionary keys."""
+    for key in keys:
+        if isinstance(data, dict):
+            data = data.get(key)
+        elif isinstance(data, list) and len(data) > 0:
+            data = data[0]
+        else:
+            return default
+    return data
+
+
+def find_product_data(next_data):
+    """Locate the product object inside a parsed __NEXT_DATA__ payload."""
+    return get_nested_value(
+        next_data, ["props", "pageProps", "product"]
+    ) or get_nested_value(
+        next_data,
+        ["props", "initialProps", "pageProps", "initialData", "products", 0],
+    )
+
+
+def extract_product_info(product_data, url):
+    """Map a Carrefour product object to the fields we export."""
+    return {
+        "id": product_data.get("id"),
+        "ean": get_nested_value(product_data, ["attributes", "ean"]),
+        "sku": get_nested_value(
+            product_data, ["offers", 0, "stores", 0, "storeData", "sku"]
+        ),
+        "title": product_data.get("title"),
+        "brandName": get_nested_value(
+            product_data, ["attributes", "brandName"]
+        ),
+        "brandCode": get_nested_value(
+            product_data, ["attributes", "brandCode"]
+        ),
+        "description": get_nested_value(
+            product_data, ["attributes", "description"]
+        ),
+        "price": get_nested_value(
+            product_data, ["offers", 0, "stores", 0, "price", "value"]
+        ),
+        "currency": get_nested_value(
+            product_data, ["offers", 0, "stores", 0, "price", "currencyISO"]
+        ),
+        "stockStatus": get_nested_value(
+            product_data,
+            ["offers", 0, "stores", 0, "quantity", "stockIndicator", "status"],
+        ),
+        "url": url,
+    }
+
+
+def parse_next_data(content, url):
+    """Parse raw __NEXT_DATA__ text into product info, or None if no product is present."""
+    product_data = find_product_data(json.loads(content))
+    return extract_product_info(product_data, url) if product_data else None
@@ -0,0 +1,106 @@
+"""
+Compare the old per-output serialization with encode_record.
+
+    python common/benchmark_record_encoder.py [n_records]
+"""
+import os
+import sys
+import csv
+import json
+import time
+import random
+from io import StringIO
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common import record_encoder  # noqa: E402
+from common.record_encoder import encode_record  # noqa: E402
+
+
+def make_advert(i):
+    """A record shaped like jiji's extract_advert output."""
+    return {
+        "category_id": 81,
+        "category_slug": "houses-apartments-for-rent",
+        "attrs": {f"attr_{k}": random.choice(["Yes", "No", "2", "Furnished"]) for k in range(12)},
+        "count_views": random.randint(0, 5000),
+        "date_created": "2024-05-01 10:00:00",
+        "date_modified": "2024-05-02 12:00:00",
+        "description": "Spacious apartment with parking and backup generator. " * 5,
+        "fav_count": random.randint(0, 50),
+        "guid": f"guid{i:08d}",
+        "id": i,
+        "images": [f"https://pictures-kenya.jijistatic.com/{i}_{k}.jpg" for k in range(8)],
+        "is_active": True,
+        "is_closed": False,
+        "is_in_moderation": False,
+        "price_value": 45000,
+        "price_period": "per month",
+        "region_name": "Kilimani",
+        "region_slug": "kilimani",
+        "region_text": "Nairobi, Kilimani",
+        "title": "2bdrm Apartment in Kilimani for rent",
+        "seller": {
+            "advert_id": i, "adverts_count": 120, "date_created": "2020-01-01",
+            "feedback_count": 4, "guid": "sellerguid", "id": 77, "image_url": None,
+            "name": "Agent", "page_url": "/sellerpage-77", "status": "active",
+        },
+    }
+
+
+def legacy_write(records, jsonl_out, csv_out):
+    """The jiji main loop before encode_record."""
+    csv_writer = None
+    for details in records:
+        jsonl_out.write(json.dumps(details) + "\n")
+        csv_ready_details = details.copy()
+        csv_ready_details["attrs"] = json.dumps(csv_ready_details.get("attrs", {}))
+        csv_ready_details["seller"] = json.dumps(csv_ready_details.get("seller", {}))
+        csv_ready_details["images"] = json.dumps(csv_ready_details.get("images", []))
+        if csv_writer is None:
+            fieldnames = sorted(csv_ready_details.keys())
+            csv_writer = csv.DictWriter(csv_out, fieldnames=fieldnames)
+            csv_writer.writeheader()
+        row_data = {field: csv_ready_details.get(field) for field in fieldnames}
+        csv_writer.writerow(row_data)
+
+
+def encoder_write(records, jsonl_out, csv_out):
+    csv_writer = None
+    for details in records:
+        line, row = encode_record(details)
+        jsonl_out.write(line)
+        if csv_writer is None:
+            csv_writer = csv.DictWriter(csv_out, fieldnames=sorted(row))
+            csv_writer.writeheader()
+        csv_writer.writerow(row)
+
+
+def bench(write, records):
+    start = time.perf_counter()
+    write(records, StringIO(), StringIO())
+    return len(records) / (time.perf_counter() - start)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    records = [make_advert(i) for i in range(n)]
+    print(f"📄 Serializing {n} jiji-shaped records to JSONL + CSV\n")
+
+    results = [("legacy json.dumps x4", bench(legacy_write, records))]
+    orjson = record_encoder.orjson
+    record_encoder.orjson = None
+    results.append(("encode_record (json)", bench(encoder_write, records)))
+    record_encoder.orjson = orjson
+    if orjson:
+        results.append(("encode_record (orjson)", bench(encoder_write, records)))
+    else:
+        print("⚠️ orjson not installed; skipping the orjson backend")
+
+    baseline = results[0][1]
+    print(f"{'writer':<26}{'records/s':>12}{'speedup':>10}")
+    for name, rate in results:
+        print(f"{name:<26}{rate:>12.0f}{rate / baseline:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
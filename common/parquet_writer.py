@@ -0,0 +1,189 @@
+import os
+import json
+import threading
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+DEFAULT_ROW_GROUP_SIZE = 10_000
+STRING_MAP = pa.map_(pa.string(), pa.string())
+STRING_LIST = pa.list_(pa.string())
+
+
+class ParquetWriter:
+    """
+    Thread-safe, row-group batched Parquet writer.
+    Records are buffered as dicts and written as one row group every
+    `row_group_size` records; `transform` reshapes a record to match the
+    schema (e.g. splitting a mixed-type field) before it is buffered.
+    A batch that can't be written is moved to <path>.rejected.jsonl before
+    the error is raised, so later batches and close() are not blocked by it.
+    """
+
+    def __init__(self, path, schema, row_group_size=DEFAULT_ROW_GROUP_SIZE, transform=None):
+        self.path = path
+        self.schema = schema
+        self.row_group_size = row_group_size
+        self.transform = transform
+        self.buffer = []
+        self.rows_written = 0
+        self.rows_rejected = 0
+        self.rejected_path = path + ".rejected.jsonl"
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.writer = pq.ParquetWriter(path, schema, compression="zstd")
+
+    def write(self, record):
+        if self.transform:
+            record = self.transform(record)
+        with self.lock:
+            self.buffer.append(record)
+            if len(self.buffer) >= self.row_group_size:
+                self._flush()
+
+    def _flush(self):
+        if not self.buffer:
+            return
+        batch, self.buffer = self.buffer, []
+        try:
+            self.writer.write_table(pa.Table.from_pylist(batch, schema=self.schema))
+        except Exception:
+            self._reject(batch)
+            raise
+        self.rows_written += len(batch)
+
+    def _reject(self, batch):
+        with open(self.rejected_path, "a", encoding="utf-8") as f:
+            for record in batch:
+                f.write(json.dumps(record, default=str) + "\n")
+        self.rows_rejected += len(batch)
+
+    def close(self):
+        with self.lock:
+            try:
+                self._flush()
+            finally:
+                self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def stringify_values(mapping):
+    """Map values as strings so they fit a map<string, string> column."""
+    if not mapping:
+        return None
+    return {k: None if v is None else str(v) for k, v in mapping.items()}
+
+
+def to_float(value):
+    """Parse numeric strings such as Shopify money amounts."""
+    try:
+        return float(value) if value not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
+
+
+# --- businesslist profiles ---
+BUSINESSLIST_PROFILE_SCHEMA = pa.schema([
+    ("company_name", pa.string()),
+    ("company_url", pa.string()),
+    ("categories", STRING_LIST),
+    ("tagline", pa.string()),
+    ("rating", pa.int32()),
+    ("photo_links", STRING_LIST),
+    ("address", pa.string()),
+    ("maps_url", pa.string()),
+    ("is_verified", pa.bool_()),
+    ("phone_numbers", STRING_LIST),
+    ("website", pa.string()),
+    ("operating_hours", STRING_MAP),
+    ("extra_information", STRING_MAP),
+    # company_description is either free text or a key/value table on the site
+    ("company_description", pa.struct([("text", pa.string()), ("table", STRING_MAP)])),
+    ("tags", STRING_LIST),
+])
+
+
+def businesslist_profile_row(data):
+    row = dict(data)
+    description = (data.get("company_description") or {}).get("description")
+    if isinstance(description, dict):
+        row["company_description"] = {"text": None, "table": stringify_values(description)}
+    elif description is not None:
+        row["company_description"] = {"text": description, "table": None}
+    else:
+        row["company_description"] = None
+    return row
+
+
+# --- jiji adverts ---
+JIJI_SELLER_TYPE = pa.struct([
+    ("advert_id", pa.int64()),
+    ("adverts_count", pa.int64()),
+    ("date_created", pa.string()),
+    ("feedback_count", pa.int64()),
+    ("guid", pa.string()),
+    ("id", pa.int64()),
+    ("image_url", pa.string()),
+    ("name", pa.string()),
+    ("page_url", pa.string()),
+    ("status", pa.string()),
+])
+
+JIJI_ADVERT_SCHEMA = pa.schema([
+    ("category_id", pa.int64()),
+    ("category_slug", pa.string()),
+    ("attrs", STRING_MAP),
+    ("count_views", pa.int64()),
+    ("date_created", pa.string()),
+    ("date_modified", pa.string()),
+    ("description", pa.string()),
+    ("fav_count", pa.int64()),
+    ("guid", pa.string()),
+    ("id", pa.int64()),
+    ("images", STRING_LIST),
+    ("is_active", pa.bool_()),
+    ("is_closed", pa.bool_()),
+    ("is_in_moderation", pa.bool_()),
+    ("price_value", pa.float64()),
+    ("price_period", pa.string()),
+    ("region_name", pa.string()),
+    ("region_slug", pa.string()),
+    ("region_text", pa.string()),
+    ("title", pa.string()),
+    ("seller", JIJI_SELLER_TYPE),
+])
+
+
+def jiji_advert_row(details):
+    row = dict(details)
+    row["attrs"] = stringify_values(details.get("attrs"))
+    return row
+
+
+# --- shopzetu products ---
+SHOPZETU_PRODUCT_SCHEMA = pa.schema([
+    ("collection_handle", pa.string()),
+    ("title", pa.string()),
+    ("id", pa.string()),
+    ("createdAt", pa.string()),
+    ("url", pa.string()),
+    ("image_url", pa.string()),
+    ("price_min", pa.float64()),
+    ("price_max", pa.float64()),
+    ("vendor", pa.string()),
+    ("tags", STRING_LIST),
+    # variant nodes are passed through from the storefront API as JSON
+    ("variants", pa.string()),
+])
+
+
+def shopzetu_product_row(product):
+    row = dict(product)
+    row["price_min"] = to_float(product.get("price_min"))
+    row["price_max"] = to_float(product.get("price_max"))
+    row["variants"] = json.dumps(product.get("variants") or [], ensure_ascii=False)
+    return row
@@ -0,0 +1,88 @@
+import time
+import threading
+from email.utils import parsedate_to_datetime
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket shared by every request to a site.
+    The rate adapts AIMD-style: each throttled response (429/503) cuts it by
+    `decrease` and pauses the bucket for Retry-After (or one interval); each
+    successful response adds it back slowly, up to the configured rate.
+    """
+
+    def __init__(self, rate, burst=None, min_rate=None, decrease=0.5, increase=0.05):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate or rate / 10
+        self.burst = burst or max(1, int(rate))
+        self.decrease = decrease
+        self.increase = increase  # requests/second regained per successful response
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "throttled": 0, "wait_seconds": 0.0, "paused_seconds": 0.0}
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Block until this caller may send a request."""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1  # reserve a token; negative means waiting in line
+            wait = max(self.paused_until - now, -self.tokens / self.rate, 0.0)
+            self.stats["requests"] += 1
+
+        waited = 0.0
+        while wait > 0:
+            time.sleep(wait)
+            waited += wait
+            # A throttle response may have extended the pause while we slept
+            with self.lock:
+                wait = self.paused_until - time.monotonic()
+
+        if waited:
+            with self.lock:
+                self.stats["wait_seconds"] += waited
+
+    def on_success(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, retry_after=None):
+        """Slow down after a 429/503; `retry_after` is the server's requested pause in seconds."""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            pause = retry_after if retry_after is not None else 1 / self.rate
+            until = now + pause
+            if until > self.paused_until:
+                self.stats["paused_seconds"] += until - max(self.paused_until, now)
+                self.paused_until = until
+            self.stats["throttled"] += 1
+
+    def report(self):
+        s = self.stats
+        return (
+            f"{s['requests']} requests, {s['throttled']} throttled, "
+            f"{s['wait_seconds']:.1f}s spent waiting, {s['paused_seconds']:.1f}s paused by the server, "
+            f"current rate {self.rate:.2f} req/s"
+        )
@@ -0,0 +1,40 @@
+import json
+
+try:
+    import orjson
+except ImportError:  # optional; falls back to the standard library
+    orjson = None
+
+BACKEND = "orjson" if orjson else "json"
+
+
+def dumps(value):
+    """Serialize to a JSON string with the fastest available backend."""
+    if orjson:
+        return orjson.dumps(value).decode("utf-8")
+    return json.dumps(value, ensure_ascii=False)
+
+
+def encode_record(record):
+    """
+    Encode a record once for both outputs. Returns (jsonl_line, csv_row):
+    each nested (dict/list) field is serialized a single time and that text
+    is used both inside the JSONL line and as the CSV cell; scalar fields
+    go to CSV as-is. Scalar keys keep their order at the start of the line.
+    """
+    scalars = {}
+    nested = []
+    for key, value in record.items():
+        if isinstance(value, (dict, list)):
+            nested.append((key, dumps(value)))
+        else:
+            scalars[key] = value
+
+    line = dumps(scalars)
+    if nested:
+        parts = ",".join(f"{dumps(key)}:{encoded}" for key, encoded in nested)
+        line = f"{line[:-1]},{parts}}}" if scalars else f"{{{parts}}}"
+
+    csv_row = scalars
+    csv_row.update(nested)
+    return line + "\n", csv_row
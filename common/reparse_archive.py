@@ -0,0 +1,89 @@
+"""
+Re-run the current parsers over a raw response archive.
+
+    python common/reparse_archive.py businesslist ../data/raw_archive
+    python common/reparse_archive.py jiji raw_archive -o listings_reparsed.jsonl
+"""
+import os
+import sys
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(REPO_DIR)
+for source_dir in ("businesslist", "jiji", "carrefour"):
+    sys.path.append(os.path.join(REPO_DIR, source_dir))
+
+from common.response_archive import ResponseArchive, read_object  # noqa: E402
+
+
+def parse_businesslist(body, url, meta):
+    from profile_parser import parse_business_profile
+
+    data = parse_business_profile(body.decode("utf-8"), url)
+    data.update(meta or {})
+    return data
+
+
+def parse_jiji(body, url, meta):
+    from extract_listing_urls import extract_advert
+
+    return extract_advert(json.loads(body))
+
+
+def parse_carrefour(body, url, meta):
+    from product_parser import parse_next_data
+
+    return parse_next_data(body, url)
+
+
+PARSERS = {
+    "businesslist": parse_businesslist,
+    "jiji": parse_jiji,
+    "carrefour": parse_carrefour,
+}
+
+
+def reparse_entry(task):
+    """Parse one archived response. Returns (record, error)."""
+    archive_dir, entry = task
+    try:
+        body = read_object(archive_dir, entry["sha256"])
+        return PARSERS[entry["source"]](body, entry["url"], entry.get("meta")), None
+    except Exception as e:
+        return None, f"{entry['url']} -- {e}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-parse archived raw responses.")
+    parser.add_argument("source", choices=sorted(PARSERS))
+    parser.add_argument("archive_dir")
+    parser.add_argument("-o", "--output", help="JSONL output (default: <source>_reparsed.jsonl)")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    output = args.output or f"{args.source}_reparsed.jsonl"
+    archive = ResponseArchive(args.archive_dir)
+    tasks = [(args.archive_dir, entry) for entry in archive.iter_latest(args.source)]
+    print(f"📦 Re-parsing {len(tasks)} archived {args.source} responses with {args.workers} processes...")
+
+    parsed = failed = 0
+    with (
+        open(output, "w", encoding="utf-8") as out,
+        ProcessPoolExecutor(max_workers=args.workers) as executor,
+    ):
+        for record, error in executor.map(reparse_entry, tasks, chunksize=64):
+            if record:
+                out.write(json.dumps(record) + "\n")
+                parsed += 1
+            else:
+                failed += 1
+                if error:
+                    print(f"❌ {error}")
+
+    print(f"\n✅ Done. {parsed} records written to {output} ({failed} skipped)")
+
+
+if __name__ == "__main__":
+    main()
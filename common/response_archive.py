@@ -0,0 +1,87 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import zstandard
+
+COMPRESSION_LEVEL = 10
+
+
+class ResponseArchive:
+    """
+    Content-addressed archive of raw response bodies.
+    Each distinct body is stored once as objects/<sha256[:2]>/<sha256>.zst and
+    manifest.jsonl records which source/URL it was fetched for and when, so
+    parsers can later be re-run over the archive without touching the site.
+    """
+
+    def __init__(self, archive_dir, level=COMPRESSION_LEVEL):
+        self.archive_dir = archive_dir
+        self.manifest_path = os.path.join(archive_dir, "manifest.jsonl")
+        self.level = level
+        self.lock = threading.Lock()
+        self.local = threading.local()  # zstd contexts are not thread-safe
+        # Directories are created by the first record(), so opening an archive has no side effects
+
+    def _compressor(self):
+        if not hasattr(self.local, "compressor"):
+            self.local.compressor = zstandard.ZstdCompressor(level=self.level)
+        return self.local.compressor
+
+    def object_path(self, digest):
+        return os.path.join(self.archive_dir, "objects", digest[:2], f"{digest}.zst")
+
+    def record(self, source, url, body, meta=None):
+        """Archive a response body (str or bytes) and return its sha256 digest."""
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        digest = hashlib.sha256(body).hexdigest()
+        path = self.object_path(digest)
+
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(self._compressor().compress(body))
+            os.replace(tmp_path, path)
+
+        entry = {
+            "source": source,
+            "url": url,
+            "fetched_at": time.time(),
+            "sha256": digest,
+            "size": len(body),
+        }
+        if meta:
+            entry["meta"] = meta
+        line = json.dumps(entry) + "\n"
+        with self.lock:
+            with open(self.manifest_path, "a", encoding="utf-8") as f:
+                f.write(line)
+        return digest
+
+    def iter_latest(self, source=None):
+        """Yield the most recent manifest entry for every archived URL."""
+        latest = {}
+        if not os.path.exists(self.manifest_path):
+            return
+        with open(self.manifest_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # partial line from an interrupted write
+                if source and entry["source"] != source:
+                    continue
+                key = (entry["source"], entry["url"])
+                if key not in latest or entry["fetched_at"] >= latest[key]["fetched_at"]:
+                    latest[key] = entry
+        yield from latest.values()
+
+
+def read_object(archive_dir, digest):
+    """Decompress an archived body. A plain function so process pools can call it."""
+    path = os.path.join(archive_dir, "objects", digest[:2], f"{digest}.zst")
+    with open(path, "rb") as f:
+        return zstandard.ZstdDecompressor().decompress(f.read())
@@ -0,0 +1,40 @@
+import json
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from common.parquet_writer import ParquetWriter
+
+SCHEMA = pa.schema([("id", pa.int64()), ("name", pa.string())])
+
+
+def test_bad_batch_is_rejected_and_does_not_block_later_flushes(tmp_path):
+    path = str(tmp_path / "part.parquet")
+    writer = ParquetWriter(path, SCHEMA, row_group_size=2)
+    writer.write({"id": 1, "name": "a"})
+    with pytest.raises((pa.ArrowInvalid, pa.ArrowTypeError)):
+        writer.write({"id": "not a number", "name": "b"})
+
+    writer.write({"id": 3, "name": "c"})
+    writer.write({"id": 4, "name": "d"})
+    writer.write({"id": 5, "name": "e"})
+    writer.close()
+
+    assert pq.read_table(path).column("id").to_pylist() == [3, 4, 5]
+    assert writer.rows_written == 3
+    assert writer.rows_rejected == 2
+    with open(writer.rejected_path, encoding="utf-8") as f:
+        assert [json.loads(line)["name"] for line in f] == ["a", "b"]
+
+
+def test_close_writes_the_file_even_if_the_last_batch_fails(tmp_path):
+    path = str(tmp_path / "part.parquet")
+    writer = ParquetWriter(path, SCHEMA)
+    writer.write({"id": 1, "name": "a"})
+    writer.write({"id": "x", "name": "b"})
+    with pytest.raises((pa.ArrowInvalid, pa.ArrowTypeError)):
+        writer.close()
+
+    assert pq.read_table(path).num_rows == 0
+    assert writer.rows_rejected == 2
@@ -0,0 +1,68 @@
+"""
+Items/second of the product cleaning pipeline: the old regex-per-field
+version against clean_item and the column-wise clean_columns.
+
+    python benchmark_pipeline.py [n_items]
+"""
+import re
+import sys
+import time
+import random
+
+from itemadapter import ItemAdapter
+
+from ecommerce_scraper.items import ProductItem
+from ecommerce_scraper.pipelines import clean_item, clean_columns
+
+
+def legacy_extract_number(text):
+    match = re.search(r"\d+", text.replace(",", "")) if isinstance(text, str) else None
+    return int(match.group()) if match else text
+
+
+def legacy_clean(adapter):
+    """CleanProductDataPipeline.process_item before precompiled patterns."""
+    for field in ("old_price", "current_price", "discount_percent", "remaining_stock"):
+        if adapter.get(field):
+            adapter[field] = legacy_extract_number(adapter[field])
+    if adapter.get("size"):
+        adapter["size"] = re.sub(r"Pack size\s*:\s*", "", adapter["size"]).strip()
+
+
+def make_item():
+    price = random.choice([99, 349.5, 1299.5, 2450, 12999])
+    return ProductItem(
+        title="Sample product",
+        size=random.choice(["Pack size : 500g", "Pack size : 1kg", "Pack size : 2L", "Pack size :6 x 330ml"]),
+        current_price=f"KES {price:,.2f}",
+        old_price=f"KES {price * 1.2:,.2f}",
+        discount_percent=random.choice(["-10%", "-20%", "-25%"]),
+        remaining_stock=random.choice(["Only 3 left", "Only 12 left", "Low stock: 1 left"]),
+        url="https://www.carrefour.ke/mafken/en/p/1",
+    )
+
+
+def bench(name, items, clean):
+    adapters = [ItemAdapter(ProductItem(item)) for item in items]
+    start = time.perf_counter()
+    clean(adapters)
+    rate = len(adapters) / (time.perf_counter() - start)
+    sample = adapters[0]
+    print(f"{name:<22}{rate:>12.0f}   {sample['current_price']!r} {sample.get('currency')!r}")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    items = [make_item() for _ in range(n)]
+    print(f"🧹 Cleaning {n} items\n")
+    print(f"{'pipeline':<22}{'items/s':>12}   sample price, currency")
+    bench("legacy (per item)", items, lambda adapters: [legacy_clean(a) for a in adapters])
+    bench("clean_item", items, lambda adapters: [clean_item(a) for a in adapters])
+    for size in (100, 500):
+        bench(f"clean_columns ({size})", items, lambda adapters: [
+            clean_columns(adapters[i:i + size]) for i in range(0, len(adapters), size)
+        ])
+
+
+if __name__ == "__main__":
+    main()
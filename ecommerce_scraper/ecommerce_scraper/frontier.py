@@ -0,0 +1,233 @@
+import os
+import time
+import uuid
+import pickle
+import socket
+import sqlite3
+from collections import deque
+
+from scrapy import signals
+from scrapy.utils.request import request_from_dict
+
+from .scheduler import DomainDelayScheduler
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+DEAD = "dead"
+
+
+class SqliteFrontier:
+    """
+    Request frontier shared by several crawler processes through one SQLite file.
+    Rows are keyed by request fingerprint, which is the dedup. A process leases
+    a batch of pending rows for `lease_seconds`. If it dies, the lease expires
+    and another process picks the rows up. A row leased `max_leases` times
+    without finishing is parked as dead.
+    """
+
+    def __init__(self, path, lease_seconds=300, max_leases=5):
+        self.lease_seconds = lease_seconds
+        self.max_leases = max_leases
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Autocommit mode, so transactions are only the explicit BEGIN IMMEDIATE ones
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS requests (
+                fingerprint TEXT PRIMARY KEY,
+                priority INTEGER NOT NULL,
+                payload BLOB NOT NULL,
+                status TEXT NOT NULL,
+                lease_owner TEXT,
+                lease_expires REAL,
+                leases INTEGER NOT NULL DEFAULT 0,
+                enqueued_at REAL NOT NULL
+            )
+            """
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS requests_ready ON requests (status, priority DESC, enqueued_at)"
+        )
+
+    def close(self):
+        self.conn.close()
+
+    def push(self, fingerprint, priority, payload, reset=False):
+        """
+        Add a request unless its fingerprint is already known; returns True if it was stored.
+        With `reset` (retries) an existing row is replaced and made pending again.
+        """
+        now = time.time()
+        if reset:
+            self.conn.execute(
+                "INSERT INTO requests (fingerprint, priority, payload, status, enqueued_at) "
+                "VALUES (?, ?, ?, ?, ?) ON CONFLICT (fingerprint) DO UPDATE SET "
+                "priority = excluded.priority, payload = excluded.payload, status = excluded.status, "
+                "lease_owner = NULL, lease_expires = NULL, enqueued_at = excluded.enqueued_at",
+                (fingerprint, priority, payload, PENDING, now),
+            )
+            return True
+        cur = self.conn.execute(
+            "INSERT OR IGNORE INTO requests (fingerprint, priority, payload, status, enqueued_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (fingerprint, priority, payload, PENDING, now),
+        )
+        return cur.rowcount > 0
+
+    def lease(self, owner, limit):
+        """Lease up to `limit` pending or expired rows, highest priority first. Returns [(fingerprint, payload, expired)]."""
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute(
+                "UPDATE requests SET status = ? WHERE status = ? AND lease_expires < ? AND leases >= ?",
+                (DEAD, LEASED, now, self.max_leases),
+            )
+            rows = self.conn.execute(
+                "SELECT fingerprint, payload, status FROM requests "
+                "WHERE status = ? OR (status = ? AND lease_expires < ?) "
+                "ORDER BY priority DESC, enqueued_at LIMIT ?",
+                (PENDING, LEASED, now, limit),
+            ).fetchall()
+            self.conn.executemany(
+                "UPDATE requests SET status = ?, lease_owner = ?, lease_expires = ?, leases = leases + 1 "
+                "WHERE fingerprint = ?",
+                [(LEASED, owner, now + self.lease_seconds, fp) for fp, _, _ in rows],
+            )
+            self.conn.execute("COMMIT")
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        return [(fp, payload, status == LEASED) for fp, payload, status in rows]
+
+    def renew(self, owner):
+        """Extend every lease this owner holds, e.g. while requests wait in its host queues."""
+        self.conn.execute(
+            "UPDATE requests SET lease_expires = ? WHERE status = ? AND lease_owner = ?",
+            (time.time() + self.lease_seconds, LEASED, owner),
+        )
+
+    def done(self, fingerprint):
+        self.conn.execute(
+            "UPDATE requests SET status = ?, lease_owner = NULL, lease_expires = NULL "
+            "WHERE fingerprint = ? AND status = ?",
+            (DONE, fingerprint, LEASED),
+        )
+
+    def release(self, owner):
+        """Hand this owner's unfinished leases back, e.g. on a clean shutdown."""
+        self.conn.execute(
+            "UPDATE requests SET status = ?, lease_owner = NULL, lease_expires = NULL, leases = leases - 1 "
+            "WHERE status = ? AND lease_owner = ?",
+            (PENDING, LEASED, owner),
+        )
+
+    def counts(self):
+        rows = self.conn.execute("SELECT status, COUNT(*) FROM requests GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def outstanding(self):
+        """Rows that may still need crawling: pending, or leased by anyone (leases can expire)."""
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM requests WHERE status IN (?, ?)", (PENDING, LEASED)
+        ).fetchone()[0]
+
+
+class FrontierScheduler(DomainDelayScheduler):
+    """
+    DomainDelayScheduler whose queue is a SqliteFrontier at FRONTIER_DB, so any
+    number of crawler processes (run the same spider several times) share one
+    deduplicated frontier. Each process leases FRONTIER_PREFETCH requests at a
+    time into its per-host staging. It renews those leases while they wait,
+    and marks a request done once it leaves the downloader. A retry puts its
+    row back to pending.
+
+    The frontier's fingerprint key replaces the dupefilter. Requests with
+    dont_filter that aren't retries are still stored only once, so start
+    requests aren't repeated by every process that joins. Delete the database
+    to start a fresh crawl.
+    """
+
+    def __init__(self, *args, frontier=None, prefetch=16, poll_interval=1.0, **kwargs):
+        super().__init__(*args, staged_max=prefetch, **kwargs)
+        self.frontier = frontier
+        self.poll_interval = poll_interval
+        self.owner = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.leased = deque()
+        self.renewed_at = time.monotonic()
+        self.outstanding_at = 0.0
+        self.outstanding = 0
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        scheduler = super().from_crawler(crawler)
+        scheduler.staged_max = settings.getint("FRONTIER_PREFETCH", 16)
+        scheduler.poll_interval = settings.getfloat("FRONTIER_POLL_INTERVAL", 1.0)
+        scheduler.frontier = SqliteFrontier(
+            settings.get("FRONTIER_DB", "frontier.db"),
+            lease_seconds=settings.getfloat("FRONTIER_LEASE_SECONDS", 300),
+            max_leases=settings.getint("FRONTIER_MAX_LEASES", 5),
+        )
+        crawler.signals.connect(scheduler.request_left_downloader, signal=signals.request_left_downloader)
+        return scheduler
+
+    def close(self, reason):
+        self.frontier.release(self.owner)
+        self.stats.set_value("frontier/counts", self.frontier.counts())
+        self.frontier.close()
+        return super().close(reason)
+
+    def next_request(self):
+        request = super().next_request()
+        if request is None and self._backend_len() > 0:
+            # Other processes may add requests or let leases expire at any
+            # time, so check back rather than wait for the engine's heartbeat
+            self._schedule_wakeup(self.poll_interval)
+        return request
+
+    def _fingerprint(self, request):
+        return self.crawler.request_fingerprinter.fingerprint(request).hex()
+
+    # --- backend hooks ---
+
+    def _enqueue_backend(self, request):
+        payload = pickle.dumps(request.to_dict(spider=self.spider), protocol=pickle.HIGHEST_PROTOCOL)
+        is_retry = request.dont_filter and request.meta.get("retry_times")
+        added = self.frontier.push(self._fingerprint(request), request.priority, payload, reset=bool(is_retry))
+        if added:
+            self.outstanding_at = 0.0  # recount on the next check
+            self.stats.inc_value("scheduler/enqueued")
+        else:
+            self.stats.inc_value("frontier/duplicates")
+        return added
+
+    def _next_from_backend(self):
+        now = time.monotonic()
+        if now - self.renewed_at > self.frontier.lease_seconds / 3:
+            self.frontier.renew(self.owner)
+            self.renewed_at = now
+        if not self.leased:
+            for fingerprint, payload, expired in self.frontier.lease(self.owner, self.staged_max):
+                self.leased.append(payload)
+                self.stats.inc_value("frontier/leased")
+                if expired:
+                    self.stats.inc_value("frontier/reclaimed")
+        if not self.leased:
+            return None
+        self.stats.inc_value("scheduler/dequeued")
+        return request_from_dict(pickle.loads(self.leased.popleft()), spider=self.spider)
+
+    def _backend_len(self):
+        # Polled on every engine loop, so the count is refreshed at most once a second
+        now = time.monotonic()
+        if now - self.outstanding_at > 1:
+            self.outstanding = self.frontier.outstanding()
+            self.outstanding_at = now
+        return max(self.outstanding - self.staged - len(self.delayed), len(self.leased))
+
+    def request_left_downloader(self, request, spider):
+        self.frontier.done(self._fingerprint(request))
+        self.stats.inc_value("frontier/done")
@@ -7,6 +7,7 @@ class ProductItem(scrapy.Item):
     brand_link = scrapy.Field()
     current_price = scrapy.Field()
     old_price = scrapy.Field()
+    currency = scrapy.Field()
     discount_percent = scrapy.Field()
     remaining_stock = scrapy.Field()
     product_highlight = scrapy.Field()
@@ -1,42 +1,141 @@
-from scrapy.downloadermiddlewares.retry import RetryMiddleware
-from twisted.internet import reactor, defer
+import os
+import sys
+import time
+import random
+import logging
+from collections import deque
 
+from scrapy.downloadermiddlewares.retry import RetryMiddleware, get_retry_request
+from scrapy.utils.response import response_status_message
 
-class PerRequestDelayMiddleware:
-    """
-    Middleware that applies per-request delay if request.meta['download_delay'] is set.
-    Uses Twisted's callLater to avoid blocking.
-    """
-    def process_request(self, request, spider):
-        delay = request.meta.get("download_delay")
-        if delay and delay > 0:
-            spider.logger.debug(f"⏳ Delaying request {request.url} by {delay} seconds")
+from . import signals
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from common.rate_limiter import parse_retry_after  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+# Floor for RETRY_BASE_DELAY: with a base of 0 the jitter range collapses to 0
+MIN_RETRY_BASE_DELAY = 0.5
+
+
+class HostBreaker:
+    """Sliding window of recent outcomes for one host, and how often it has tripped."""
+
+    def __init__(self, window):
+        self.outcomes = deque(maxlen=window)  # True for an error
+        self.trips = 0
 
-            d = defer.Deferred()
-            reactor.callLater(delay, d.callback, None)
-            return d
-        return None
+    def error_rate(self):
+        return sum(self.outcomes) / len(self.outcomes) if self.outcomes else 0.0
 
 
 class CustomRetryMiddleware(RetryMiddleware):
     """
-    RetryMiddleware with exponential backoff, integrated with PerRequestDelayMiddleware.
-    Instead of blocking with time.sleep, it sets request.meta['download_delay'].
+    RetryMiddleware with decorrelated-jitter backoff and a per-host circuit breaker,
+    integrated with DomainDelayScheduler. Nothing sleeps here:
+    - a retry carries meta['retry_not_before'], and the scheduler holds it until then;
+      the delay is the response's Retry-After when it sent one, otherwise
+      min(RETRY_MAX_DELAY, uniform(base, previous delay * 3)) so retries spread out;
+    - a 429/503 with Retry-After, or an error rate above BREAKER_ERROR_RATE over
+      the last BREAKER_WINDOW responses, pauses that host's queue in the scheduler
+      (the host_paused signal) while other hosts keep going. Repeated trips double
+      the pause up to BREAKER_MAX_PAUSE.
     """
     def __init__(self, settings):
         super().__init__(settings)
-        self.base_delay = settings.getint("DOWNLOAD_DELAY", 1)
+        self.base_delay = max(settings.getfloat("RETRY_BASE_DELAY", 1.0), MIN_RETRY_BASE_DELAY)
+        self.max_delay = settings.getfloat("RETRY_MAX_DELAY", 60)
+        self.breaker_window = settings.getint("BREAKER_WINDOW", 20)
+        self.breaker_min_requests = settings.getint("BREAKER_MIN_REQUESTS", 10)
+        self.breaker_error_rate = settings.getfloat("BREAKER_ERROR_RATE", 0.5)
+        self.breaker_pause = settings.getfloat("BREAKER_PAUSE", 30)
+        self.breaker_max_pause = settings.getfloat("BREAKER_MAX_PAUSE", 600)
+        self.breakers = {}
 
-    def _retry(self, request, reason, spider):
-        retries = request.meta.get("retry_times", 0) + 1
-        delay = self.base_delay * (2 ** (retries - 1))  # exponential backoff
+    @classmethod
+    def from_crawler(cls, crawler):
+        middleware = super().from_crawler(crawler)
+        middleware.stats = crawler.stats
+        return middleware
 
-        spider.logger.warning(
-            "🔄 Retrying %(url)s (retry %(count)d), reason: %(reason)s, applying %(delay)d seconds delay",
-            {"url": request.url, "count": retries, "reason": reason, "delay": delay},
+    def process_response(self, request, response, spider=None):
+        failed = response.status in self.retry_http_codes
+        self._record(request, failed)
+        if response.status in (429, 503):
+            retry_after = parse_retry_after(response.headers.get("Retry-After", b"").decode("latin-1"))
+            if retry_after is not None:
+                request.meta["retry_after"] = retry_after
+                self._pause(request, retry_after, f"Retry-After on {response.status}")
+        if request.meta.get("dont_retry", False) or not failed:
+            return response
+        return self._retry(request, response_status_message(response.status)) or response
+
+    def process_exception(self, request, exception, spider=None):
+        if not isinstance(exception, self.exceptions_to_retry):
+            return None
+        self._record(request, True)
+        if request.meta.get("dont_retry", False):
+            return None
+        return self._retry(request, exception)
+
+    def _retry(self, request, reason, spider=None):
+        retry_after = request.meta.pop("retry_after", None)
+        if retry_after is not None:
+            delay = min(retry_after, self.max_delay)
+            self.stats.inc_value("retry/retry_after_honoured")
+        else:
+            # Decorrelated jitter: never two retries marching in step
+            previous = max(request.meta.get("retry_delay") or 0, self.base_delay)
+            delay = min(self.max_delay, random.uniform(self.base_delay, previous * 3))
+
+        new_request = get_retry_request(
+            request,
+            reason=reason,
+            spider=self.crawler.spider,
+            max_retry_times=request.meta.get("max_retry_times", self.max_retry_times),
+            priority_adjust=request.meta.get("priority_adjust", self.priority_adjust),
+        )
+        if new_request is None:
+            return None
+
+        logger.warning(
+            "🔄 Retrying %(url)s (retry %(count)d), reason: %(reason)s, in %(delay).1f seconds",
+            {"url": request.url, "count": new_request.meta["retry_times"], "reason": reason, "delay": delay},
         )
+        # Wall-clock time so the value means the same thing in any process
+        new_request.meta["retry_delay"] = delay
+        new_request.meta["retry_not_before"] = time.time() + delay
+        self.stats.inc_value("retry/delay_seconds", delay)
+        return new_request
+
+    # --- circuit breaker ---
+
+    def _slot_key(self, request):
+        return self.crawler.engine.downloader.get_slot_key(request)
+
+    def _record(self, request, failed):
+        key = self._slot_key(request)
+        breaker = self.breakers.get(key)
+        if breaker is None:
+            breaker = self.breakers[key] = HostBreaker(self.breaker_window)
+        breaker.outcomes.append(failed)
+        if len(breaker.outcomes) < self.breaker_min_requests:
+            return
+        error_rate = breaker.error_rate()
+        if error_rate >= self.breaker_error_rate:
+            pause = min(self.breaker_max_pause, self.breaker_pause * 2 ** breaker.trips)
+            breaker.trips += 1
+            breaker.outcomes.clear()  # judge the host afresh after the pause
+            self.stats.inc_value("breaker/trips")
+            self.stats.inc_value(f"breaker/trips/{key}")
+            self._pause(request, pause, f"{error_rate:.0%} errors over the last {self.breaker_window} responses")
+        elif not failed:
+            breaker.trips = 0
 
-        # Instead of sleeping, set per-request delay
-        new_request = request.copy()
-        new_request.meta["download_delay"] = delay
-        return super()._retry(new_request, reason, spider)
+    def _pause(self, request, seconds, reason):
+        key = self._slot_key(request)
+        logger.warning("⛔ Pausing %s for %.0f seconds (%s)", key, seconds, reason)
+        self.stats.inc_value("breaker/paused_seconds", seconds)
+        self.stats.inc_value(f"breaker/paused_seconds/{key}", seconds)
+        self.crawler.signals.send_catch_log(signals.host_paused, slot=key, seconds=seconds, reason=reason)
@@ -1,37 +1,157 @@
 import re
 import logging
+from functools import lru_cache
+from decimal import Decimal, InvalidOperation
 from itemadapter import ItemAdapter
+from twisted.internet import defer, reactor
 
 logger = logging.getLogger(__name__)
 
-class CleanProductDataPipeline:
-    def process_item(self, item, spider):
-        adapter = ItemAdapter(item)
+# "1,299.50", "1 299", "20" -- thousands separators are dropped, decimals kept
+NUMBER_RE = re.compile(r"\d+(?:[,\s]\d{3})*(?:\.\d+)?")
+INTEGER_RE = re.compile(r"\d+(?:,\d{3})*")
+CURRENCY_RE = re.compile(r"\b(KES|Kshs?|USD|EUR|GBP)(?![A-Za-z])|([$€£])", re.IGNORECASE)
+CURRENCY_ALIASES = {"ksh": "KES", "kshs": "KES", "$": "USD", "€": "EUR", "£": "GBP"}
+PACK_SIZE_RE = re.compile(r"Pack size\s*:\s*")
+
+# Prices, discounts, stock messages and sizes repeat a lot across a catalogue,
+# so parsed values are memoised per distinct raw string
+PARSE_CACHE_SIZE = 4096
+
+PRICE_FIELDS = ("old_price", "current_price")
+INTEGER_FIELDS = ("discount_percent", "remaining_stock")
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_price(text):
+    """'KES 1,299.50' -> (Decimal('1299.50'), 'KES'); unparseable text is returned unchanged."""
+    if not isinstance(text, str):
+        return text, None
+    match = NUMBER_RE.search(text)
+    if not match:
+        return text, None
+    try:
+        amount = Decimal(re.sub(r"[,\s]", "", match.group()))
+    except InvalidOperation:
+        return text, None
+    currency = CURRENCY_RE.search(text)
+    if currency:
+        symbol = currency.group(1) or currency.group(2)
+        currency = CURRENCY_ALIASES.get(symbol.lower(), symbol.upper())
+    return amount, currency
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_integer(text):
+    """'Only 12 left' -> 12, '-20%' -> 20; unparseable text is returned unchanged."""
+    match = INTEGER_RE.search(text) if isinstance(text, str) else None
+    return int(match.group().replace(",", "")) if match else text
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def clean_size(text):
+    return PACK_SIZE_RE.sub("", text).strip() if isinstance(text, str) else text
+
+
+def clean_item(adapter):
+    """Clean one item's fields in place."""
+    currency = None
+    for field in PRICE_FIELDS:
+        if adapter.get(field):
+            adapter[field], found = parse_price(adapter[field])
+            currency = currency or found
+    if currency and not adapter.get("currency"):
+        adapter["currency"] = currency
+    for field in INTEGER_FIELDS:
+        if adapter.get(field):
+            adapter[field] = parse_integer(adapter[field])
+    if adapter.get("size"):
+        adapter["size"] = clean_size(adapter["size"])
 
-        try:
-            # Clean price fields
-            if adapter.get("old_price"):
-                adapter["old_price"] = self._extract_number(adapter["old_price"])
-            if adapter.get("current_price"):
-                adapter["current_price"] = self._extract_number(adapter["current_price"])
 
-            # Clean discount percentage
-            if adapter.get("discount_percent"):
-                adapter["discount_percent"] = self._extract_number(adapter["discount_percent"])
+def clean_columns(adapters):
+    """
+    Clean a batch column by column: each distinct raw value in a column
+    is parsed once per batch, then written back item by item.
+    """
+    def column(field, parse):
+        values = [a.get(field) for a in adapters]
+        parsed = {v: parse(v) for v in set(values) if v}
+        return [parsed.get(v, v) if v else v for v in values]
 
-            # Clean remaining stock
-            if adapter.get("remaining_stock"):
-                adapter["remaining_stock"] = self._extract_number(adapter["remaining_stock"])
+    prices = {field: column(field, parse_price) for field in PRICE_FIELDS}
+    integers = {field: column(field, parse_integer) for field in INTEGER_FIELDS}
+    sizes = column("size", clean_size)
 
-            # Clean size (remove "Pack size :")
-            if adapter.get("size"):
-                adapter["size"] = re.sub(r"Pack size\s*:\s*", "", adapter["size"]).strip()
+    for i, adapter in enumerate(adapters):
+        currency = None
+        for field, values in prices.items():
+            if adapter.get(field):
+                adapter[field], found = values[i]
+                currency = currency or found
+        if currency and not adapter.get("currency"):
+            adapter["currency"] = currency
+        for field, values in integers.items():
+            if adapter.get(field):
+                adapter[field] = values[i]
+        if adapter.get("size"):
+            adapter["size"] = sizes[i]
 
+
+class CleanProductDataPipeline:
+    def process_item(self, item, spider):
+        try:
+            clean_item(ItemAdapter(item))
         except Exception as e:
             logger.error(f"Error cleaning item {item}: {e}", exc_info=True)
 
         return item
 
-    def _extract_number(self, text):
-        match = re.search(r"\d+", text.replace(",", "")) if isinstance(text, str) else None
-        return int(match.group()) if match else text
+
+class BatchedCleanProductDataPipeline:
+    """
+    Buffers items and cleans them column-wise in batches of CLEAN_BATCH_SIZE.
+    process_item returns a Deferred that fires once the item's batch is
+    cleaned, so exporters still see every item cleaned. A batch is also
+    flushed after CLEAN_BATCH_MAX_WAIT seconds, because Scrapy stops
+    downloading once too many items are still in the pipelines.
+    """
+
+    def __init__(self, batch_size=500, max_wait=1.0):
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.batch = []  # (item, deferred)
+        self.timer = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(
+            batch_size=crawler.settings.getint("CLEAN_BATCH_SIZE", 500),
+            max_wait=crawler.settings.getfloat("CLEAN_BATCH_MAX_WAIT", 1.0),
+        )
+
+    def process_item(self, item, spider):
+        d = defer.Deferred()
+        self.batch.append((item, d))
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+        elif self.timer is None:
+            self.timer = reactor.callLater(self.max_wait, self.flush)
+        return d
+
+    def close_spider(self, spider):
+        self.flush()
+
+    def flush(self):
+        if self.timer is not None and self.timer.active():
+            self.timer.cancel()
+        self.timer = None
+        batch, self.batch = self.batch, []
+        if not batch:
+            return
+        try:
+            clean_columns([ItemAdapter(item) for item, _ in batch])
+        except Exception as e:
+            logger.error(f"Error cleaning a batch of {len(batch)} items: {e}", exc_info=True)
+        for item, d in batch:
+            d.callback(item)
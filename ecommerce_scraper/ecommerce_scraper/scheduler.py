@@ -0,0 +1,197 @@
+import heapq
+import time
+from collections import deque
+
+from scrapy.core.scheduler import Scheduler
+from twisted.internet import reactor
+
+from .signals import host_paused
+
+
+class HostQueue:
+    """Requests staged for one download slot and the time the slot may send again."""
+
+    def __init__(self):
+        self.requests = deque()  # (request, staged_at)
+        self.ready_at = 0.0
+        self.paused_until = 0.0  # set by host_paused
+        self.in_heap = False
+
+
+class DomainDelayScheduler(Scheduler):
+    """
+    Scheduler that spaces out requests per host instead of per request.
+
+    Requests still go through the regular priority queues (and JOBDIR disk
+    queues). next_request() moves them into a staging deque per download
+    slot and keeps a heap of slots ordered by the time they may send
+    again. A request is only handed to the engine once its slot is ready,
+    so waiting requests never occupy CONCURRENT_REQUESTS. When nothing is
+    ready, a timer wakes the engine at the next ready time.
+
+    The gap after each request is the larger of request.meta["download_delay"]
+    and the downloader slot's current delay, which AutoThrottle adjusts.
+    Retries wait until meta["retry_not_before"], and the host_paused signal
+    holds back a whole slot, without blocking other slots.
+    At most SCHEDULER_STAGED_MAX requests of hosts that aren't paused are
+    held in staging. Past that, requests stay in the priority queues until
+    a staged one is released. Requests of a paused host don't count toward
+    the cap, so a paused host can't fill it and stall every other host.
+
+    _enqueue_backend/_next_from_backend/_backend_len wrap the queues
+    requests come from, so a subclass can swap in another store.
+    """
+
+    def __init__(self, *args, staged_max=1000, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.staged_max = staged_max
+        self.hosts = {}
+        self.ready_heap = []  # (ready_at, seq, slot key)
+        self.seq = 0
+        self.staged = 0
+        self.delayed = []  # (not_before wall time, seq, request) for retries
+        self.wakeup = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        scheduler = super().from_crawler(crawler)
+        scheduler.staged_max = crawler.settings.getint("SCHEDULER_STAGED_MAX", 1000)
+        crawler.signals.connect(scheduler.pause_host, signal=host_paused)
+        return scheduler
+
+    def pause_host(self, slot, seconds, reason=None):
+        """Hold back every request for this download slot for `seconds`."""
+        host = self._host(slot)
+        until = time.monotonic() + seconds
+        host.ready_at = max(host.ready_at, until)
+        host.paused_until = max(host.paused_until, until)
+        # A heap entry with the old ready time is re-queued when it is popped
+
+    # --- backend hooks ---
+
+    def _enqueue_backend(self, request):
+        return super().enqueue_request(request)
+
+    def _next_from_backend(self):
+        return super().next_request()
+
+    def _backend_len(self):
+        return super().__len__()
+
+    # --- scheduler interface ---
+
+    def enqueue_request(self, request):
+        return self._enqueue_backend(request)
+
+    def next_request(self):
+        now = time.monotonic()
+        wall_now = time.time()
+        while self.delayed and self.delayed[0][0] <= wall_now:
+            self._stage(heapq.heappop(self.delayed)[2], now)
+        paused = sum(len(host.requests) for host in self.hosts.values() if host.paused_until > now)
+        while self.staged - paused < self.staged_max:
+            request = self._next_from_backend()
+            if request is None:
+                break
+            if request.meta.get("retry_not_before", 0) > wall_now:
+                self.seq += 1
+                heapq.heappush(self.delayed, (request.meta["retry_not_before"], self.seq, request))
+                continue
+            if self._stage(request, now).paused_until > now:
+                paused += 1
+        self.stats.set_value("scheduler/staged/paused", paused)
+
+        while self.ready_heap and self.ready_heap[0][0] <= now:
+            _, _, key = heapq.heappop(self.ready_heap)
+            host = self.hosts[key]
+            host.in_heap = False
+            if not host.requests:
+                continue
+            if host.ready_at > now:  # paused since this entry was pushed
+                self._push(key, host)
+                continue
+            request, staged_at = host.requests.popleft()
+            self.staged -= 1
+            host.ready_at = now + self._delay_for(request)
+            if host.requests:
+                self._push(key, host)
+            self._record_release(now - staged_at)
+            return request
+
+        waits = []
+        if self.ready_heap:
+            waits.append(self.ready_heap[0][0] - now)
+        if self.delayed:
+            waits.append(self.delayed[0][0] - wall_now)
+        if waits:
+            self._schedule_wakeup(min(waits))
+        return None
+
+    def has_pending_requests(self):
+        return self.staged > 0 or len(self.delayed) > 0 or self._backend_len() > 0
+
+    def __len__(self):
+        return self.staged + len(self.delayed) + self._backend_len()
+
+    def close(self, reason):
+        if self.wakeup is not None and self.wakeup.active():
+            self.wakeup.cancel()
+        return super().close(reason)
+
+    # --- staging ---
+
+    def _slot_key(self, request):
+        return self.crawler.engine.downloader.get_slot_key(request)
+
+    def _delay_for(self, request):
+        """Gap to leave after this request on its slot."""
+        delay = request.meta.get("download_delay") or 0
+        slot = self.crawler.engine.downloader.slots.get(self._slot_key(request))
+        if slot is not None:
+            delay = max(delay, slot.delay)
+        return delay
+
+    def _host(self, key):
+        host = self.hosts.get(key)
+        if host is None:
+            host = self.hosts[key] = HostQueue()
+        return host
+
+    def _stage(self, request, now):
+        key = self._slot_key(request)
+        host = self._host(key)
+        host.requests.append((request, now))
+        self.staged += 1
+        if not host.in_heap:
+            self._push(key, host)
+        self.stats.max_value(f"scheduler/staged/max_depth/{key}", len(host.requests))
+        self.stats.max_value("scheduler/staged/max", self.staged)
+        return host
+
+    def _push(self, key, host):
+        self.seq += 1
+        host.in_heap = True
+        heapq.heappush(self.ready_heap, (host.ready_at, self.seq, key))
+
+    def _record_release(self, waited):
+        self.stats.inc_value("scheduler/staged/released")
+        self.stats.inc_value("scheduler/staged/wait_seconds", waited)
+        self.stats.max_value("scheduler/staged/max_wait_seconds", waited)
+        self.stats.set_value("scheduler/staged/depth", self.staged)
+
+    # --- waking the engine ---
+
+    def _schedule_wakeup(self, delay):
+        delay = max(delay, 0)
+        if self.wakeup is not None and self.wakeup.active():
+            if self.wakeup.getTime() <= reactor.seconds() + delay:
+                return
+            self.wakeup.cancel()
+        self.wakeup = reactor.callLater(delay, self._wake_engine)
+
+    def _wake_engine(self):
+        # The engine only asks for requests when something nudges it; this
+        # is the same call it makes itself after each download finishes
+        slot = getattr(self.crawler.engine, "_slot", None)
+        if slot is not None:
+            slot.nextcall.schedule()
@@ -25,6 +25,15 @@ ROBOTSTXT_OBEY = False
 RETRY_ENABLED = True
 RETRY_TIMES = 2
 RETRY_HTTP_CODES = [500, 502, 503, 504, 522, 524, 408, 429]
+RETRY_BASE_DELAY = 1  # decorrelated jitter between this and 3x the previous delay
+RETRY_MAX_DELAY = 60  # also caps how long a Retry-After is honoured for one request
+
+# Per-host circuit breaker: pause a host whose recent responses are mostly errors
+BREAKER_WINDOW = 20
+BREAKER_MIN_REQUESTS = 10
+BREAKER_ERROR_RATE = 0.5
+BREAKER_PAUSE = 30  # doubles on each consecutive trip
+BREAKER_MAX_PAUSE = 600
 
 # Concurrency and throttling settings
 DOWNLOAD_DELAY = 1
@@ -34,17 +43,39 @@ AUTOTHROTTLE_START_DELAY = 1
 AUTOTHROTTLE_MAX_DELAY = 30
 AUTOTHROTTLE_TARGET_CONCURRENCY = 3.0
 
+# Product URL dedup: set a file to remember scraped products across runs (skips them next time)
+SEEN_URLS_FILE = None
+SEEN_URLS_MMAP = False  # map the file instead of reading it into memory
+
 # Enable pipelines
 ITEM_PIPELINES = {
     "ecommerce_scraper.pipelines.CleanProductDataPipeline": 300,
+    # or clean items in column-wise batches before export:
+    # "ecommerce_scraper.pipelines.BatchedCleanProductDataPipeline": 300,
 }
+CLEAN_BATCH_SIZE = 500
+CLEAN_BATCH_MAX_WAIT = 1.0  # seconds a partial batch may wait
 
 # Enable custom retry middleware
 DOWNLOADER_MIDDLEWARES = {
-    "ecommerce_scraper.middlewares.PerRequestDelayMiddleware": 542,
     "ecommerce_scraper.middlewares.CustomRetryMiddleware": 543,
 }
 
+# Per-host spacing: requests wait in the scheduler (not in download slots)
+# until their host is ready, honouring meta["download_delay"] and AutoThrottle
+SCHEDULER = "ecommerce_scraper.scheduler.DomainDelayScheduler"
+SCHEDULER_STAGED_MAX = 1000
+
+# Shared frontier: to spread one crawl over several processes, switch the
+# scheduler and start `scrapy crawl carrefour` as many times as needed
+# (all pointing at the same FRONTIER_DB). Delete the file for a fresh crawl.
+# SCHEDULER = "ecommerce_scraper.frontier.FrontierScheduler"
+FRONTIER_DB = "frontier.db"
+FRONTIER_PREFETCH = 16  # requests each process leases at a time
+FRONTIER_LEASE_SECONDS = 300  # a crashed process's requests are handed out again after this
+FRONTIER_MAX_LEASES = 5  # then a request that never finishes is parked as dead
+FRONTIER_POLL_INTERVAL = 1.0
+
 # PLAYWRIGHT SETTINGS
 # ------------------------
 DOWNLOAD_HANDLERS = {
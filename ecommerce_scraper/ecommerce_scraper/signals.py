@@ -0,0 +1,5 @@
+"""Signals shared by the middlewares and the scheduler."""
+
+# Sent when requests to one download slot should stop for a while.
+# Arguments: slot (download slot key), seconds, reason
+host_paused = object()
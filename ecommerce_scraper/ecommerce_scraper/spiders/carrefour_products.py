@@ -1,5 +1,6 @@
 import scrapy
 from ..items import ProductItem
+from ..url_fingerprints import UrlFingerprintSet
 from scrapy_playwright.page import PageMethod
 
 
@@ -14,8 +15,31 @@ class CarrefourSpider(scrapy.Spider):
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.seen_urls = set()
-        
+        # 8 bytes per product URL instead of a set of strings:
+        # scheduled_urls dedups sitemap entries within a run, seen_urls holds
+        # products that were actually scraped
+        self.scheduled_urls = UrlFingerprintSet()
+        self.seen_urls = UrlFingerprintSet()
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        # With SEEN_URLS_FILE, products scraped by earlier runs are skipped too
+        spider.seen_urls = UrlFingerprintSet(
+            crawler.settings.get("SEEN_URLS_FILE"),
+            use_mmap=crawler.settings.getbool("SEEN_URLS_MMAP"),
+        )
+        return spider
+
+    def closed(self, reason):
+        self.logger.info(
+            "🧮 %d product URLs scheduled, %d scraped (~%.1f MB)",
+            len(self.scheduled_urls),
+            len(self.seen_urls),
+            (self.scheduled_urls.nbytes() + self.seen_urls.nbytes()) / 1e6,
+        )
+        self.seen_urls.close()
+
     def parse(self, response):
         """Parse the main sitemap index and follow product sitemaps."""
         product_sitemaps = response.xpath(
@@ -45,21 +69,21 @@ class CarrefourSpider(scrapy.Spider):
             self.logger.warning("⚠️ No product URLs found in sitemap: %s", response.url)
 
         for loc in product_urls:
-            
-            if loc not in self.seen_urls:
-                self.seen_urls.add(loc)
-                yield scrapy.Request(
-                    url=loc,
-                    callback=self.parse_product,
-                    meta={
-                        "download_delay": self.product_delay,
-                        "playwright": True,
-                        "playwright_page_methods": [
-                            PageMethod("wait_for_load_state", "domcontentloaded"),
-                        ],
-                    },
-                    errback=self.handle_failure,
-                )
+            if loc in self.seen_urls or not self.scheduled_urls.add(loc):
+                continue
+            yield scrapy.Request(
+                url=loc,
+                callback=self.parse_product,
+                meta={
+                    "sitemap_url": loc,  # response.url may differ after a redirect
+                    "download_delay": self.product_delay,
+                    "playwright": True,
+                    "playwright_page_methods": [
+                        PageMethod("wait_for_load_state", "domcontentloaded"),
+                    ],
+                },
+                errback=self.handle_failure,
+            )
 
     def parse_product(self, response):
         """Extract fields from product page safely."""
@@ -81,6 +105,8 @@ class CarrefourSpider(scrapy.Spider):
         item["product_description"] = response.css("div.css-1weog53::text").get()
         item["url"] = response.url
 
+        # Only products that were actually scraped are remembered across runs
+        self.seen_urls.add(response.meta.get("sitemap_url", response.url))
         yield item
 
     def handle_failure(self, failure):
@@ -0,0 +1,97 @@
+import os
+import mmap
+import heapq
+from array import array
+from bisect import bisect_left
+from hashlib import blake2b
+
+# Recently added fingerprints live in a set until there are this many (or
+# 1/8 of the array, so merges stay rare as it grows), then they are merged
+# into the sorted array
+MERGE_THRESHOLD = 65536
+
+
+def url_fingerprint(url):
+    """64-bit fingerprint of a URL."""
+    return int.from_bytes(blake2b(url.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class UrlFingerprintSet:
+    """
+    Set of URLs stored as 64-bit fingerprints: a sorted array('Q') (8 bytes
+    per URL, binary-searched) plus a small set of recent additions. With a
+    `path` the array is loaded from and saved back to that file, so the set
+    survives across runs; `use_mmap` maps the file read-only instead of
+    reading it, until the first merge. Every entry is a url_fingerprint(),
+    so *_fingerprint() expect values from that function too.
+    """
+
+    def __init__(self, path=None, use_mmap=False):
+        self.path = path
+        self.sorted = array("Q")
+        self.pending = set()
+        self._mmap = None
+        if path and os.path.exists(path) and os.path.getsize(path):
+            if use_mmap:
+                with open(path, "rb") as f:
+                    self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self.sorted = memoryview(self._mmap).cast("Q")
+            else:
+                with open(path, "rb") as f:
+                    self.sorted.frombytes(f.read())
+
+    def __len__(self):
+        return len(self.sorted) + len(self.pending)
+
+    def __contains__(self, url):
+        return self.contains_fingerprint(url_fingerprint(url))
+
+    def contains_fingerprint(self, fp):
+        if fp in self.pending:
+            return True
+        i = bisect_left(self.sorted, fp)
+        return i < len(self.sorted) and self.sorted[i] == fp
+
+    def add(self, url):
+        """Add a URL; returns False if it was already present."""
+        return self.add_fingerprint(url_fingerprint(url))
+
+    def add_fingerprint(self, fp):
+        if self.contains_fingerprint(fp):
+            return False
+        self.pending.add(fp)
+        if len(self.pending) >= max(MERGE_THRESHOLD, len(self.sorted) // 8):
+            self._merge()
+        return True
+
+    def _merge(self):
+        if not self.pending:
+            return
+        merged = array("Q", heapq.merge(self.sorted, sorted(self.pending)))
+        self._release_mmap()
+        self.sorted = merged
+        self.pending = set()
+
+    def _release_mmap(self):
+        if self._mmap is not None:
+            self.sorted.release()
+            self._mmap.close()
+            self._mmap = None
+
+    def nbytes(self):
+        """Approximate memory held: 8 bytes per merged fingerprint, more for pending ones."""
+        return len(self.sorted) * 8 + len(self.pending) * 64
+
+    def save(self):
+        """Write every fingerprint to `path` (atomically) if the set has one."""
+        if not self.path or (self._mmap is not None and not self.pending):
+            return  # nothing added since the file was mapped
+        self._merge()
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            self.sorted.tofile(f)
+        os.replace(tmp_path, self.path)
+
+    def close(self):
+        self.save()
+        self._release_mmap()
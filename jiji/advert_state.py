@@ -0,0 +1,91 @@
+import os
+import time
+import sqlite3
+import threading
+
+ACTIVE = "active"
+CLOSED = "closed"
+REMOVED = "removed"
+
+
+class AdvertState:
+    """
+    SQLite record of every advert seen, keyed by GUID, holding the
+    date_modified of the last successfully fetched details. Used to fetch
+    details only for adverts that are new or changed since the last run.
+    """
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS adverts (
+                guid TEXT PRIMARY KEY,
+                slug TEXT NOT NULL,
+                date_modified TEXT,
+                status TEXT NOT NULL,
+                last_seen_run TEXT,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS adverts_slug ON adverts (slug, last_seen_run)")
+        self.conn.commit()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def needs_fetch(self, guid, date_modified):
+        """True if the advert is new, changed, or the listing gave no date_modified to compare."""
+        if date_modified is None:
+            return True
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT date_modified, status FROM adverts WHERE guid = ?", (guid,)
+            ).fetchone()
+        return row is None or row[0] != str(date_modified) or row[1] != ACTIVE
+
+    def mark_seen(self, slug, guids, run_id):
+        """Note that these GUIDs were still listed in this run."""
+        now = time.time()
+        with self.lock:
+            self.conn.executemany(
+                "INSERT INTO adverts (guid, slug, status, last_seen_run, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (guid) DO UPDATE SET last_seen_run = excluded.last_seen_run",
+                [(guid, slug, ACTIVE, run_id, now) for guid in guids],
+            )
+            self.conn.commit()
+
+    def record(self, guid, slug, date_modified, status=ACTIVE):
+        """Store the date_modified of freshly fetched details."""
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO adverts (guid, slug, date_modified, status, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (guid) DO UPDATE SET date_modified = excluded.date_modified, "
+                "status = excluded.status, updated_at = excluded.updated_at",
+                (guid, slug, None if date_modified is None else str(date_modified), status, time.time()),
+            )
+            self.conn.commit()
+
+    def set_status(self, guid, status):
+        with self.lock:
+            self.conn.execute(
+                "UPDATE adverts SET status = ?, updated_at = ? WHERE guid = ?",
+                (status, time.time(), guid),
+            )
+            self.conn.commit()
+
+    def mark_removed(self, slug, run_id):
+        """Mark adverts of this slug that were not listed in this run as removed. Returns the count."""
+        with self.lock:
+            cur = self.conn.execute(
+                "UPDATE adverts SET status = ?, updated_at = ? "
+                "WHERE slug = ? AND status != ? AND (last_seen_run IS NULL OR last_seen_run != ?)",
+                (REMOVED, time.time(), slug, REMOVED, run_id),
+            )
+            self.conn.commit()
+        return cur.rowcount
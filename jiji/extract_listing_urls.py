@@ -1,8 +1,27 @@
+import os
+import sys
 import requests
 import json
 import csv
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import queue
+import threading
+import uuid
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.response_archive import ResponseArchive  # noqa: E402
+from common.rate_limiter import TokenBucket, parse_retry_after  # noqa: E402
+from common.record_encoder import encode_record  # noqa: E402
+from advert_state import AdvertState, ACTIVE, CLOSED  # noqa: E402
+
+ARCHIVE_DIR = "raw_archive"
+ARCHIVE = ResponseArchive(ARCHIVE_DIR)  # raw item responses for re-parsing; None to disable
+
+# Every jiji request (listing pages and item details) shares this limiter
+REQUESTS_PER_SECOND = 5
+RATE_LIMITER = TokenBucket(rate=REQUESTS_PER_SECOND, burst=REQUESTS_PER_SECOND)
 
 
 def format_attrs(attrs):
@@ -34,12 +53,13 @@ def extract_seller(s):
 
 
 def extract_advert(advert):
-    ad = advert.get("advert", {})
-    seller = advert.get("seller", {})
+    # Any of these may be null in the API response, not just missing
+    ad = advert.get("advert") or {}
+    seller = advert.get("seller") or {}
     return {
         "category_id": ad.get("category_id"),
         "category_slug": ad.get("category_slug"),
-        "attrs": format_attrs(ad.get("attrs", [])),
+        "attrs": format_attrs(ad.get("attrs") or []),
         "count_views": ad.get("count_views"),
         "date_created": ad.get("date_created"),
         "date_modified": ad.get("date_modified"),
@@ -47,12 +67,12 @@ def extract_advert(advert):
         "fav_count": ad.get("fav_count"),
         "guid": ad.get("guid"),
         "id": ad.get("id"),
-        "images": [img.get("url") for img in ad.get("images", []) if img.get("url")],
+        "images": [img.get("url") for img in ad.get("images") or [] if img.get("url")],
         "is_active": ad.get("is_active"),
         "is_closed": ad.get("is_closed"),
         "is_in_moderation": ad.get("is_in_moderation"),
-        "price_value": ad.get("price", {}).get("value"),
-        "price_period": ad.get("price", {}).get("period"),
+        "price_value": (ad.get("price") or {}).get("value"),
+        "price_period": (ad.get("price") or {}).get("period"),
         "region_name": ad.get("region_name"),
         "region_slug": ad.get("region_slug"),
         "region_text": ad.get("region_text"),
@@ -61,43 +81,100 @@ def extract_advert(advert):
     }
 
 
-def extract_listing_guid(session, slug, page=1):
+def make_session(headers, pool_size):
+    """Session whose connection pool can keep `pool_size` keep-alive connections open."""
+    session = requests.Session()
+    session.headers.update(headers)
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    return session
+
+
+class SessionPool:
+    """
+    Fixed set of Sessions handed out one per worker, so no two threads share
+    (or mutate) the same Session and each keeps its own keep-alive connection.
+    """
+
+    def __init__(self, size, headers):
+        self.sessions = queue.Queue()
+        for _ in range(size):
+            self.sessions.put(make_session(headers, pool_size=1))
+
+    @contextmanager
+    def session(self):
+        session = self.sessions.get()
+        try:
+            yield session
+        finally:
+            self.sessions.put(session)
+
+    def close(self):
+        while not self.sessions.empty():
+            self.sessions.get().close()
+
+
+def limited_get(session, url, **kwargs):
+    """GET through the shared rate limiter, feeding 429/503 responses back into it."""
+    RATE_LIMITER.acquire()
+    r = session.get(url, **kwargs)
+    if r.status_code in (429, 503):
+        RATE_LIMITER.on_throttle(parse_retry_after(r.headers.get("Retry-After")))
+    else:
+        RATE_LIMITER.on_success()
+    return r
+
+
+def extract_listing_page(session, slug, page=1):
+    """Return (advert summaries, total_pages) for a listing page; total_pages is 0 on error."""
     url = "https://jiji.co.ke/api_web/v1/listing"
     params = {"slug": slug, "page": page}
     try:
-        r = session.get(url, params=params)
+        r = limited_get(session, url, params=params)
         r.raise_for_status()
         data = r.json()
         total_pages = data.get("adverts_list", {}).get("total_pages", 0)
         adverts = data.get("adverts_list", {}).get("adverts", [])
-        listing_guids = [advert["guid"] for advert in adverts if "guid" in advert]
-        return listing_guids, total_pages
+        summaries = [
+            {
+                "guid": advert["guid"],
+                "date_modified": advert.get("date_modified"),
+                "is_closed": advert.get("is_closed"),
+            }
+            for advert in adverts
+            if "guid" in advert
+        ]
+        return summaries, total_pages
     except (requests.exceptions.RequestException, json.JSONDecodeError) as e:
         print(f"Error fetching page {page}: {e}")
         return [], 0
 
 
+def extract_listing_guid(session, slug, page=1):
+    summaries, total_pages = extract_listing_page(session, slug, page)
+    return [summary["guid"] for summary in summaries], total_pages
+
+
 def extract_listing_details(session, guid, slug):
     url = f"https://jiji.co.ke/api_web/v1/item/{guid}"
-    session.headers.update({"Referer": f"https://jiji.co.ke/{slug}/{guid}.html"})
+    # Per-request header: sessions are shared across calls, so never mutate them
+    headers = {"Referer": f"https://jiji.co.ke/{slug}/{guid}.html"}
 
     max_retries = 3
-    backoff_factor = 0.5  # Wait 0.5s, 1s, 2s between retries
 
     for attempt in range(max_retries):
         try:
-            r = session.get(url)
+            r = limited_get(session, url, headers=headers)
             r.raise_for_status()
             data = r.json()
+            if ARCHIVE:
+                ARCHIVE.record("jiji", url, r.content)
             return extract_advert(data)
         except requests.exceptions.HTTPError as e:
             # Check for "Too Many Requests" status code
+            # The shared limiter has already slowed down and paused for Retry-After
             if e.response.status_code == 429 and attempt < max_retries - 1:
-                wait_time = backoff_factor * (2**attempt)
-                print(
-                    f"Rate limit hit for GUID {guid}. Retrying in {wait_time:.2f}s..."
-                )
-                time.sleep(wait_time)
+                print(f"Rate limit hit for GUID {guid}. Retrying after shared backoff...")
             else:
                 print(f"HTTP error for GUID {guid}: {e}")
                 return None  # Give up on other HTTP errors or after max retries
@@ -109,96 +186,336 @@ def extract_listing_details(session, guid, slug):
     return None
 
 
-def main():
-    SLUG = "houses-apartments-for-rent"
-    JSONL_FILE = "listings.jsonl"
-    CSV_FILE = "listings.csv"
-    MAX_WORKERS = 10  # Number of concurrent threads
+# Marks the end of a detail worker's output on the result queue
+WORKER_DONE = object()
 
-    all_guids = []
 
-    headers = {"User-Agent": "Mozilla/5.0"}
-    with requests.Session() as session:
-        session.headers.update(headers)
+class RecordFiles:
+    """
+    A pair of <name>.jsonl/.csv files written from the same encoded records.
+    If a record has a column the CSV header lacks (e.g. appending to a file
+    from a run with other settings), the CSV is rewritten with the wider
+    header rather than dropping the column.
+    """
 
-        # Make the first request to get the total number of pages
-        print("Fetching page 1 to get total pages...")
-        first_page_guids, total_pages = extract_listing_guid(session, SLUG, page=1)
+    def __init__(self, out_dir, name, append=False):
+        self.jsonl_path = os.path.join(out_dir, f"{name}.jsonl")
+        self.csv_path = os.path.join(out_dir, f"{name}.csv")
+        self.csv_writer = None
+        self.fieldnames = None
+        if append and os.path.exists(self.csv_path) and os.path.getsize(self.csv_path):
+            with open(self.csv_path, newline="", encoding="utf-8") as f:
+                self.fieldnames = next(csv.reader(f))
+        mode = "a" if append else "w"
+        self.jsonl_file = open(self.jsonl_path, mode, encoding="utf-8")
+        self.csv_file = open(self.csv_path, mode, newline="", encoding="utf-8")
+        if self.fieldnames:
+            self.csv_writer = csv.DictWriter(self.csv_file, fieldnames=self.fieldnames, extrasaction="ignore")
+
+    def read_column(self, field):
+        """Values of one column already in the CSV file (used when appending)."""
+        if not self.fieldnames or field not in self.fieldnames:
+            return []
+        with open(self.csv_path, newline="", encoding="utf-8") as f:
+            return [row[field] for row in csv.DictReader(f)]
+
+    def write(self, record):
+        # Nested fields (attrs, seller, images) are encoded once and the same
+        # JSON text goes into both the JSONL line and the CSV cell
+        line, row = encode_record(record)
+        self.jsonl_file.write(line)
+
+        # For the first successful record, create the DictWriter and write the header
+        if self.csv_writer is None:
+            # Sort keys for consistent column order
+            self.fieldnames = sorted(row)
+            self.csv_writer = csv.DictWriter(self.csv_file, fieldnames=self.fieldnames)
+            self.csv_writer.writeheader()
+        elif not row.keys() <= set(self.fieldnames):
+            self._widen(row)
+
+        self.csv_writer.writerow(row)
+
+    def _widen(self, row):
+        """Rewrite the CSV with the columns of `row` added to its header."""
+        fieldnames = self.fieldnames + sorted(row.keys() - set(self.fieldnames))
+        self.csv_file.close()
+        tmp_path = self.csv_path + ".tmp"
+        with (
+            open(self.csv_path, newline="", encoding="utf-8") as old,
+            open(tmp_path, "w", newline="", encoding="utf-8") as new,
+        ):
+            writer = csv.DictWriter(new, fieldnames=fieldnames)
+            writer.writeheader()
+            writer.writerows(csv.DictReader(old))
+        os.replace(tmp_path, self.csv_path)
+        print(f"Added columns {fieldnames[len(self.fieldnames):]} to {self.csv_path}")
 
-        if not total_pages:
-            print("Could not determine total pages. Exiting.")
-            return
+        self.fieldnames = fieldnames
+        self.csv_file = open(self.csv_path, "a", newline="", encoding="utf-8")
+        self.csv_writer = csv.DictWriter(self.csv_file, fieldnames=self.fieldnames)
 
-        all_guids.extend(first_page_guids)
-        print(f"Found {total_pages} total pages.")
+    def close(self):
+        self.jsonl_file.close()
+        self.csv_file.close()
 
-        # Loop through the remaining pages to get all GUIDs
-        for page_num in range(2, total_pages + 1):
-            print(f"Fetching GUIDs from page {page_num}...")
-            page_guids, _ = extract_listing_guid(session, SLUG, page=page_num)
-            if page_guids:
-                all_guids.extend(page_guids)
 
-    print(f"\nFound {len(all_guids)} total listings. Now fetching details...")
+class SellerTable:
+    """
+    sellers.jsonl/.csv shared by every slug of a run, with each seller
+    written once. Only the ids already written are kept in memory.
+    """
 
-    # Prepare files for writing
-    with (
-        open(JSONL_FILE, "w") as jsonl_file,
-        open(CSV_FILE, "w", newline="", encoding="utf-8") as csv_file,
-    ):
-        csv_writer = None  # Initialize csv_writer
+    def __init__(self, out_dir, append=False):
+        os.makedirs(out_dir, exist_ok=True)
+        self.files = RecordFiles(out_dir, "sellers", append)
+        # CSV round-trips ids as strings, so compare them as strings
+        self.ids = set(self.files.read_column("id"))
 
-        # Use ThreadPoolExecutor to fetch details concurrently
-        with (
-            requests.Session() as detail_session,
-            ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor,
-        ):
-            detail_session.headers.update(headers)
-
-            # Submit all detail extraction tasks
-            future_to_guid = {
-                executor.submit(
-                    extract_listing_details, detail_session, guid, SLUG
-                ): guid
-                for guid in all_guids
-            }
+    def add(self, seller):
+        """Write a seller unless it was written before; returns its id."""
+        seller_id = seller.get("id")
+        if seller_id is not None and str(seller_id) not in self.ids:
+            self.ids.add(str(seller_id))
+            # advert_id is whichever advert the seller was first seen on
+            self.files.write(seller)
+        return seller_id
+
+    def close(self):
+        self.files.close()
+
+
+class ListingWriter:
+    """
+    Writes one slug's adverts to listings.jsonl/.csv (and optionally .parquet) in its own directory.
+    Given a SellerTable, each advert carries only a seller_id and its seller goes to
+    that table instead; the Parquet copy keeps the nested seller struct.
+    """
 
-            for i, future in enumerate(as_completed(future_to_guid)):
-                details = future.result()
-                if details:
-                    print(f"Processed {i + 1}/{len(all_guids)}: GUID {details['guid']}")
-
-                    # Write to JSONL file
-                    jsonl_file.write(json.dumps(details) + "\n")
-
-                    # --- Write to CSV File ---
-                    # Serialize nested fields to JSON strings instead of flattening
-                    csv_ready_details = details.copy()
-                    csv_ready_details["attrs"] = json.dumps(
-                        csv_ready_details.get("attrs", {})
-                    )
-                    csv_ready_details["seller"] = json.dumps(
-                        csv_ready_details.get("seller", {})
-                    )
-                    csv_ready_details["images"] = json.dumps(
-                        csv_ready_details.get("images", [])
-                    )
-
-                    # For the first successful record, create the DictWriter and write the header
-                    if csv_writer is None:
-                        fieldnames = sorted(
-                            csv_ready_details.keys()
-                        )  # Sort keys for consistent column order
-                        csv_writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
-                        csv_writer.writeheader()
-
-                    # Ensure all rows have the same headers and write the row
-                    row_data = {
-                        field: csv_ready_details.get(field) for field in fieldnames
-                    }
-                    csv_writer.writerow(row_data)
-
-    print(f"\nScraping complete. Data saved to {JSONL_FILE} and {CSV_FILE}")
+    def __init__(self, out_dir, write_parquet=False, append=False, sellers=None):
+        os.makedirs(out_dir, exist_ok=True)
+        self.listings = RecordFiles(out_dir, "listings", append)
+        self.sellers = sellers
+        # Parquet files can't be appended to, so appending runs each add a new file
+        suffix = time.strftime("-%Y%m%d-%H%M%S") if append else ""
+        self.parquet_path = os.path.join(out_dir, f"listings{suffix}.parquet")
+        self.parquet_writer = None
+        if write_parquet:
+            from common.parquet_writer import ParquetWriter, JIJI_ADVERT_SCHEMA, jiji_advert_row
+
+            self.parquet_writer = ParquetWriter(
+                self.parquet_path, JIJI_ADVERT_SCHEMA, transform=jiji_advert_row
+            )
+        self.records = 0
+        self.failures = 0
+        self.started = time.monotonic()
+        self.finished = None
+
+    def write(self, details):
+        if self.parquet_writer:
+            self.parquet_writer.write(details)
+        if self.sellers is not None:
+            details = dict(details)
+            details["seller_id"] = self.sellers.add(details.pop("seller", None) or {})
+        self.listings.write(details)
+        self.records += 1
+
+    def close(self):
+        self.finished = time.monotonic()
+        self.listings.close()
+        if self.parquet_writer:
+            self.parquet_writer.close()
+
+    def throughput(self):
+        elapsed = (self.finished or time.monotonic()) - self.started
+        return self.records / elapsed if elapsed > 0 else 0.0
+
+
+def produce_guids(session, slug, guid_queue, listing_executor, stats, state=None, run_id=None):
+    """
+    Enumerate a slug's listing pages and push each new (slug, GUID) onto
+    guid_queue as soon as its page arrives. With a `state` store, closed
+    adverts and adverts whose date_modified hasn't changed are skipped, and
+    adverts no longer listed are marked removed once every page was read.
+    """
+    seen = set()
+
+    def enqueue(summaries):
+        if state:
+            state.mark_seen(slug, [summary["guid"] for summary in summaries], run_id)
+        for summary in summaries:
+            guid = summary["guid"]
+            if guid in seen:
+                continue
+            seen.add(guid)
+            stats["guids"] += 1
+            if state:
+                if summary["is_closed"]:
+                    state.set_status(guid, CLOSED)
+                    stats["closed"] += 1
+                    continue
+                if not state.needs_fetch(guid, summary["date_modified"]):
+                    stats["unchanged"] += 1
+                    continue
+            guid_queue.put((slug, guid))  # blocks while the detail workers catch up
+
+    # Make the first request to get the total number of pages
+    print(f"[{slug}] Fetching page 1 to get total pages...")
+    first_page, total_pages = extract_listing_page(session, slug, page=1)
+
+    if not total_pages:
+        print(f"[{slug}] Could not determine total pages. Skipping.")
+        return
+
+    stats["pages"] = total_pages
+    print(f"[{slug}] Found {total_pages} total pages.")
+    enqueue(first_page)
+
+    # Fetch the remaining pages on the shared pool; map() keeps results in page order
+    pages = listing_executor.map(
+        lambda page_num: extract_listing_page(session, slug, page=page_num),
+        range(2, total_pages + 1),
+    )
+    for page_num, (page_guids, page_total) in enumerate(pages, start=2):
+        if not page_total:
+            stats["failed_pages"] += 1
+        enqueue(page_guids)
+        if page_num % 50 == 0:
+            print(f"[{slug}] Fetched {page_num}/{total_pages} pages ({stats['guids']} GUIDs)")
+
+    print(f"[{slug}] Found {stats['guids']} total listings.")
+    # Only trust "not listed any more" when every listing page was read
+    if state and not stats["failed_pages"]:
+        stats["removed"] = state.mark_removed(slug, run_id)
+
+
+def detail_worker(session_pool, guid_queue, result_queue):
+    """
+    Fetch details for (slug, GUID) pairs until the end marker arrives. An
+    advert that fails to parse is reported as missing; WORKER_DONE is sent
+    however the worker exits, so main() never waits on it forever.
+    """
+    try:
+        with session_pool.session() as session:
+            while True:
+                item = guid_queue.get()
+                if item is None:
+                    return
+                slug, guid = item
+                try:
+                    details = extract_listing_details(session, guid, slug)
+                except Exception as e:
+                    print(f"Error extracting details for GUID {guid}: {e}")
+                    details = None
+                result_queue.put((slug, details))
+    finally:
+        result_queue.put(WORKER_DONE)
+
+
+def main(slugs=None):
+    SLUGS = ["houses-apartments-for-rent"]  # default when no slugs are given on the command line
+    OUTPUT_DIR = "output"  # one sub-directory of listings per slug
+    WRITE_PARQUET = False  # also write a typed Parquet copy of the adverts
+    MAX_WORKERS = 10  # Detail threads shared by every slug
+    LISTING_WORKERS = 5  # Concurrent listing-page requests, shared by every slug
+    QUEUE_SIZE = MAX_WORKERS * 20  # GUIDs buffered between discovery and detail fetching
+    INCREMENTAL = False  # only fetch new/changed adverts and append them to the outputs
+    NORMALIZE_SELLERS = False  # write sellers once to <OUTPUT_DIR>/sellers.jsonl/.csv; adverts keep only seller_id
+    STATE_DB = os.path.join(OUTPUT_DIR, "jiji_state.db")
+
+    slugs = slugs or sys.argv[1:] or SLUGS
+    headers = {"User-Agent": "Mozilla/5.0"}
+    guid_queue = queue.Queue(maxsize=QUEUE_SIZE)
+    result_queue = queue.Queue(maxsize=QUEUE_SIZE)
+
+    state = AdvertState(STATE_DB) if INCREMENTAL else None
+    run_id = uuid.uuid4().hex  # tags adverts seen in this run
+    sellers = SellerTable(OUTPUT_DIR, append=INCREMENTAL) if NORMALIZE_SELLERS else None
+    writers = {
+        slug: ListingWriter(os.path.join(OUTPUT_DIR, slug), WRITE_PARQUET, append=INCREMENTAL, sellers=sellers)
+        for slug in slugs
+    }
+    stats = {
+        slug: {"pages": 0, "guids": 0, "failed_pages": 0, "unchanged": 0, "closed": 0, "removed": 0}
+        for slug in slugs
+    }
+    print(f"Crawling {len(slugs)} slugs with {MAX_WORKERS} detail workers: {', '.join(slugs)}")
+
+    # GUIDs stream from one producer per slug into a single pool of detail workers;
+    # every request goes through the same RATE_LIMITER. Listing threads share one
+    # session with a pool slot each; detail workers check out their own session.
+    session_pool = SessionPool(MAX_WORKERS, headers)
+    with (
+        make_session(headers, pool_size=LISTING_WORKERS) as session,
+        ThreadPoolExecutor(max_workers=LISTING_WORKERS) as listing_executor,
+    ):
+        producers = [
+            threading.Thread(
+                target=produce_guids,
+                args=(session, slug, guid_queue, listing_executor, stats[slug], state, run_id),
+                daemon=True,
+            )
+            for slug in slugs
+        ]
+        workers = [
+            threading.Thread(
+                target=detail_worker,
+                args=(session_pool, guid_queue, result_queue),
+                daemon=True,
+            )
+            for _ in range(MAX_WORKERS)
+        ]
+
+        def close_queue():
+            for producer in producers:
+                producer.join()
+            for _ in workers:
+                guid_queue.put(None)
+
+        for thread in producers + workers + [threading.Thread(target=close_queue, daemon=True)]:
+            thread.start()
+
+        processed = 0
+        finished_workers = 0
+        while finished_workers < MAX_WORKERS:
+            item = result_queue.get()
+            if item is WORKER_DONE:
+                finished_workers += 1
+                continue
+            slug, details = item
+            processed += 1
+            if details:
+                print(f"Processed {processed}: [{slug}] GUID {details['guid']}")
+                writers[slug].write(details)
+                if state:
+                    status = CLOSED if details.get("is_closed") else ACTIVE
+                    state.record(details["guid"], slug, details.get("date_modified"), status)
+            else:
+                writers[slug].failures += 1
+
+    session_pool.close()
+    for writer in writers.values():
+        writer.close()
+    if sellers:
+        sellers.close()
+    if state:
+        state.close()
+
+    print("\nScraping complete.")
+    print(
+        f"{'slug':<40}{'pages':>8}{'listed':>8}{'fetched':>9}{'unchanged':>11}"
+        f"{'closed':>8}{'removed':>9}{'failed':>8}{'adverts/s':>11}"
+    )
+    for slug, writer in writers.items():
+        st = stats[slug]
+        print(
+            f"{slug:<40}{st['pages']:>8}{st['guids']:>8}{writer.records:>9}{st['unchanged']:>11}"
+            f"{st['closed']:>8}{st['removed']:>9}{writer.failures:>8}{writer.throughput():>11.2f}"
+        )
+    if sellers:
+        print(f"{len(sellers.ids)} sellers in {sellers.files.csv_path}")
+    print(f"Data saved under {OUTPUT_DIR}/<slug>/")
+    print(f"Rate limiter: {RATE_LIMITER.report()}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,63 @@
+import os
+import json
+
+
+class CollectionState:
+    """
+    Per-collection watermark kept in <state_dir>/<handle>.json: the newest
+    createdAt (and its product id) seen so far plus every known product id.
+    Saved only after a collection was crawled to the end, so a failed run
+    never moves the watermark past products it didn't see.
+    """
+
+    def __init__(self, state_dir, handle):
+        self.path = os.path.join(state_dir, f"{handle}.json")
+        self.newest_created_at = None
+        self.newest_id = None
+        self.known_ids = set()
+        self.removed = 0
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                saved = json.load(f)
+            self.newest_created_at = saved.get("newest_created_at")
+            self.newest_id = saved.get("newest_id")
+            self.known_ids = set(saved.get("known_ids", []))
+
+    def is_known(self, product_id):
+        return product_id in self.known_ids
+
+    def reached(self, product_id, created_at):
+        """True once a newest-first listing gets to products from earlier runs."""
+        if product_id in self.known_ids:
+            return True
+        # createdAt is an ISO-8601 UTC timestamp, so string order is time order
+        return bool(self.newest_created_at and created_at and created_at < self.newest_created_at)
+
+    def update(self, seen, products_created, full):
+        """
+        Merge this run's product ids. `products_created` maps id -> createdAt
+        for new products; after a `full` crawl ids no longer listed are dropped.
+        """
+        if full:
+            self.removed = len(self.known_ids - seen)
+            self.known_ids = set(seen)
+        else:
+            self.known_ids |= seen
+        for product_id, created_at in products_created.items():
+            if created_at and (self.newest_created_at is None or created_at > self.newest_created_at):
+                self.newest_created_at = created_at
+                self.newest_id = product_id
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "newest_created_at": self.newest_created_at,
+                    "newest_id": self.newest_id,
+                    "known_ids": sorted(self.known_ids),
+                },
+                f,
+            )
+        os.replace(tmp_path, self.path)
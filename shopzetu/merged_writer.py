@@ -0,0 +1,112 @@
+import os
+import sys
+import csv
+import threading
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.record_encoder import encode_record  # noqa: E402
+
+PRODUCT_FIELDS = [
+    "id", "title", "createdAt", "url", "image_url",
+    "price_min", "price_max", "vendor", "tags",
+]
+MEMBERSHIP_FIELDS = ["product_id", "collection_handle"]
+
+
+class MergedWriter:
+    """
+    Streams products from any number of collections into three tables:
+      products.jsonl/.csv             each product once, without its variants
+      product_collections.csv         one (product_id, collection_handle) row per listing
+      variants.jsonl/.csv             one row per variant node, keyed by product_id
+    Only the set of product ids already written is kept in memory. With
+    `append`, tables from earlier runs are extended and their product ids
+    are loaded first so no product is written twice.
+    """
+
+    def __init__(self, out_dir, append=False):
+        os.makedirs(out_dir, exist_ok=True)
+        self.out_dir = out_dir
+        self.append = append
+        self.lock = threading.Lock()
+        self.seen_ids = set()
+        self.memberships = 0
+        self.variants = 0
+        self.files = []
+        if append:
+            self.seen_ids.update(row["id"] for row in self._read_csv("products.csv"))
+        self.products_jsonl = self._open("products.jsonl")
+        self.products_csv = self._csv_writer("products.csv", PRODUCT_FIELDS)
+        self.membership_csv = self._csv_writer("product_collections.csv", MEMBERSHIP_FIELDS)
+        self.variants_jsonl = self._open("variants.jsonl")
+        # columns come from the existing header or else the first variant node
+        variant_fields = next(self._read_csv("variants.csv", header=True), None) if append else None
+        self.variants_csv_file = self._open("variants.csv", newline="")
+        self.variants_csv = None
+        if variant_fields:
+            self.variants_csv = csv.DictWriter(self.variants_csv_file, fieldnames=variant_fields, extrasaction="ignore")
+
+    def _path(self, name):
+        return os.path.join(self.out_dir, name)
+
+    def _open(self, name, **kwargs):
+        f = open(self._path(name), "a" if self.append else "w", encoding="utf-8", **kwargs)
+        self.files.append(f)
+        return f
+
+    def _read_csv(self, name, header=False):
+        """Stream a table from an earlier run: its header row, or its rows as dicts."""
+        if not os.path.exists(self._path(name)):
+            return
+        with open(self._path(name), newline="", encoding="utf-8") as f:
+            yield from csv.reader(f) if header else csv.DictReader(f)
+
+    def _csv_writer(self, name, fieldnames):
+        has_header = self.append and os.path.exists(self._path(name)) and os.path.getsize(self._path(name))
+        writer = csv.DictWriter(self._open(name, newline=""), fieldnames=fieldnames, extrasaction="ignore")
+        if not has_header:
+            writer.writeheader()
+        return writer
+
+    def write(self, product):
+        """Record a product listed in product["collection_handle"]."""
+        product_id = product["id"]
+        with self.lock:
+            self.membership_csv.writerow(
+                {"product_id": product_id, "collection_handle": product["collection_handle"]}
+            )
+            self.memberships += 1
+            if product_id in self.seen_ids:
+                return
+            self.seen_ids.add(product_id)
+
+            line, row = encode_record({k: product.get(k) for k in PRODUCT_FIELDS})
+            self.products_jsonl.write(line)
+            self.products_csv.writerow(row)
+
+            for node in product.get("variants") or []:
+                line, row = encode_record({"product_id": product_id, **node})
+                self.variants_jsonl.write(line)
+                if self.variants_csv is None:
+                    self.variants_csv = csv.DictWriter(
+                        self.variants_csv_file, fieldnames=list(row), extrasaction="ignore"
+                    )
+                    self.variants_csv.writeheader()
+                self.variants_csv.writerow(row)
+                self.variants += 1
+
+    def report(self):
+        return (
+            f"{len(self.seen_ids)} products, {self.memberships} collection memberships, "
+            f"{self.variants} variants"
+        )
+
+    def close(self):
+        for f in self.files:
+            f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,104 @@
+import threading
+import requests
+
+PAGE_SIZE_CANDIDATES = (250, 100, 50, 24)
+# Responses that mean the page size itself was refused. 5xx errors are
+# transient and retried by the caller, so they never shrink the size.
+REJECTED_STATUSES = (400, 413, 422)
+
+
+class PageSizer:
+    """
+    Picks the `first` page size for the products endpoint, shared by every
+    collection. probe() finds the largest size the server accepts (or the
+    cap it silently applies); after that an EWMA of request latency steps
+    the size down a candidate when responses get slow and back up when
+    they are fast again. Cursors point at items, so the size can change
+    between pages of the same collection.
+    """
+
+    def __init__(self, candidates=PAGE_SIZE_CANDIDATES, slow_latency=5.0, alpha=0.3):
+        self.candidates = sorted(candidates, reverse=True)
+        self.slow_latency = slow_latency  # seconds per request considered too slow
+        self.alpha = alpha
+        self.max_size = None  # largest accepted size, set by probe()
+        self.size = self.candidates[-1]
+        self.latency = None  # EWMA of seconds per request at the current size
+        self.samples = 0  # requests behind that EWMA
+        self.lock = threading.Lock()
+        self.probe_lock = threading.Lock()
+        self.stats = {"requests": 0, "products": 0, "seconds": 0.0, "backoffs": 0, "rejected": []}
+
+    def probe(self, fetch):
+        """
+        Try each candidate with fetch(first) -> page data until one is accepted.
+        Returns (data, size) for that first page so it isn't fetched twice,
+        or None if another collection already probed.
+        """
+        with self.probe_lock:
+            if self.max_size is not None:
+                return None
+            error = None
+            for size in self.candidates:
+                try:
+                    data = fetch(size)
+                except requests.exceptions.HTTPError as e:
+                    if e.response is None or e.response.status_code not in REJECTED_STATUSES:
+                        raise
+                    self.stats["rejected"].append(size)
+                    error = e
+                    continue
+                products = data.get("products", [])
+                if data.get("pageInfo", {}).get("hasNextPage") and 0 < len(products) < size:
+                    size = len(products)  # the server capped the page without an error
+                with self.lock:
+                    self.max_size = self.size = size
+                    self._reset()
+                return data, size
+            raise error
+
+    def observe(self, size, products, seconds):
+        """Record one request's latency and adjust the page size."""
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats["products"] += products
+            self.stats["seconds"] += seconds
+            if size != self.size or self.max_size is None:
+                return  # sent before the last change; says nothing about the current size
+            if self.latency is None:
+                self.latency = seconds
+            else:
+                self.latency = self.alpha * seconds + (1 - self.alpha) * self.latency
+            self.samples += 1
+            if self.latency > self.slow_latency:
+                self._step_down()
+            elif self.samples >= 5 and self.latency < self.slow_latency / 3 and self.size < self.max_size:
+                # Only grow back after a run of fast responses at this size
+                self.size = min([c for c in self.candidates if c > self.size] + [self.max_size])
+                self._reset()
+
+    def on_error(self):
+        """A request timed out or the connection dropped: use smaller pages."""
+        with self.lock:
+            self._step_down()
+
+    def _step_down(self):
+        smaller = [c for c in self.candidates if c < self.size]
+        if smaller:
+            self.size = smaller[0]
+            self.stats["backoffs"] += 1
+        self._reset()
+
+    def _reset(self):
+        self.latency = None
+        self.samples = 0
+
+    def report(self):
+        s = self.stats
+        avg = s["seconds"] / s["requests"] if s["requests"] else 0.0
+        rejected = f", rejected {s['rejected']}" if s["rejected"] else ""
+        return (
+            f"max page size {self.max_size}{rejected}, current {self.size}, "
+            f"{s['requests']} requests for {s['products']} products, "
+            f"{avg:.2f}s avg latency, {s['backoffs']} backoffs"
+        )
@@ -1,63 +1,232 @@
+import os
+import sys
 import requests
 import csv
-import time
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.rate_limiter import TokenBucket, parse_retry_after  # noqa: E402
+from page_sizer import PageSizer  # noqa: E402
+from merged_writer import MergedWriter  # noqa: E402
+from collection_state import CollectionState  # noqa: E402
 
 BASE_URL = "https://shopzetu.com/api/collections/{handle}/products"
 HEADERS = {"User-Agent": "Mozilla/5.0"}
+OUTPUT_FORMATS = ("csv",)  # any of "csv", "parquet"; per-collection files only
+# Opt-in modes; with both off each collection is saved to <handle>-products.csv as before
+MERGED_OUTPUT = False  # one deduplicated set of tables across every collection
+MERGED_DIR = "shopzetu_output"
+# Only fetch products added since the last run, tracked per collection in STATE_DIR
+INCREMENTAL = False
+STATE_DIR = "shopzetu_state"
+NEWEST_FIRST_HANDLES = {"new-arrivals"}  # listed newest first, so paging can stop early
+MAX_WORKERS = 4  # collections crawled at once; pages within a collection stay sequential
 
-def fetch_products(handle, cursor=None, first=24):
+# Every request to shopzetu.com shares this limiter, whichever collection it is for
+REQUESTS_PER_SECOND = 2
+RATE_LIMITER = TokenBucket(rate=REQUESTS_PER_SECOND, burst=REQUESTS_PER_SECOND)
+# Largest `first` the endpoint accepts, shrunk while responses are slow
+PAGE_SIZER = PageSizer()
+REQUEST_TIMEOUT = 30
+
+def make_session(pool_size=MAX_WORKERS):
+    """Keep-alive session with a connection slot for each collection worker."""
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    return session
+
+def fetch_products(handle, cursor=None, first=24, session=None, max_retries=3, sizer=None):
+    """
+    Fetch one page of a collection. With a `sizer`, `first` comes from it,
+    each request's latency is reported back to it, and a timeout retries
+    with a smaller page.
+    """
     url = BASE_URL.format(handle=handle)
-    params = {"first": first}
-    if cursor:
-        params["cursor"] = cursor
-    r = requests.get(url, headers=HEADERS, params=params)
-    r.raise_for_status()
-    return r.json()
-
-def scrape_collection(handle, first=24, delay=1):
-    """Scrape all products from a single collection handle."""
-    all_products = []
+    session = session or requests
+    for attempt in range(max_retries):
+        if sizer:
+            first = sizer.size
+        params = {"first": first}
+        if cursor:
+            params["cursor"] = cursor
+        RATE_LIMITER.acquire()
+        start = time.monotonic()
+        try:
+            r = session.get(url, headers=HEADERS, params=params, timeout=REQUEST_TIMEOUT)
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+            if sizer and attempt < max_retries - 1:
+                sizer.on_error()
+                print(f"[{handle}] Request timed out, retrying with {sizer.size} products per page...")
+                continue
+            raise
+        if r.status_code in (429, 503):
+            # The shared limiter slows down and pauses for Retry-After before the next try
+            RATE_LIMITER.on_throttle(parse_retry_after(r.headers.get("Retry-After")))
+            if attempt < max_retries - 1:
+                print(f"[{handle}] Throttled ({r.status_code}), retrying after shared backoff...")
+                continue
+        elif r.status_code >= 500:
+            # A transient server error says nothing about the page size; retry it as is
+            if attempt < max_retries - 1:
+                print(f"[{handle}] Server error ({r.status_code}), retrying...")
+                time.sleep(2 ** attempt)
+                continue
+        else:
+            RATE_LIMITER.on_success()
+        r.raise_for_status()
+        data = r.json()
+        if sizer:
+            sizer.observe(first, len(data.get("products", [])), time.monotonic() - start)
+        return data
+
+def parse_product(handle, p):
+    """Flatten one storefront product node."""
+    return {
+        "collection_handle": handle,
+        "title": p.get("title"),
+        "id": p.get("id"),
+        "createdAt": p.get("createdAt"),
+        "url": f"https://shopzetu.com/products/{p.get('handle')}",
+        "image_url": (
+            p.get("featuredImage", {}).get("url")
+            if p.get("featuredImage") else None
+        ),
+        "price_min": (
+            p.get("priceRange", {}).get("minVariantPrice", {}).get("amount")
+            if p.get("priceRange") else None
+        ),
+        "price_max": (
+            p.get("priceRange", {}).get("maxVariantPrice", {}).get("amount")
+            if p.get("priceRange") else None
+        ),
+        "variants": p.get("variants", {}).get("nodes", []),
+        "vendor": p.get("vendor"),
+        "tags": p.get("tags", [])
+    }
+
+def iter_collection(handle, first=None, session=None):
+    """
+    Yield every product of a collection handle, one page at a time.
+    `first` fixes the page size; by default PAGE_SIZER picks it.
+    """
     cursor = None
     has_next = True
+    total = 0
+    sizer = PAGE_SIZER if first is None else None
+
+    # The first collection to run probes for the largest accepted page size;
+    # the page it lands on is this collection's first page
+    pending = None
+    if sizer:
+        probed = sizer.probe(lambda size: fetch_products(handle, None, size, session=session))
+        if probed:
+            pending, size = probed
+            print(f"[{handle}] Using {size} products per page")
 
     while has_next:
-        data = fetch_products(handle, cursor, first)
+        if pending is not None:
+            data, pending = pending, None
+        else:
+            # Each cursor comes from the previous response, so pages can't be requested ahead
+            data = fetch_products(handle, cursor, first, session=session, sizer=sizer)
 
         products = data.get("products", [])
+        total += len(products)
+        print(f"[{handle}] Fetched {len(products)} products, total {total}")
         for p in products:
-            all_products.append({
-                "collection_handle": handle,
-                "title": p.get("title"),
-                "id": p.get("id"),
-                "createdAt": p.get("createdAt"),
-                "url": f"https://shopzetu.com/products/{p.get('handle')}",
-                "image_url": (
-                    p.get("featuredImage", {}).get("url")
-                    if p.get("featuredImage") else None
-                ),
-                "price_min": (
-                    p.get("priceRange", {}).get("minVariantPrice", {}).get("amount")
-                    if p.get("priceRange") else None
-                ),
-                "price_max": (
-                    p.get("priceRange", {}).get("maxVariantPrice", {}).get("amount")
-                    if p.get("priceRange") else None
-                ),
-                "variants": p.get("variants", {}).get("nodes", []),
-                "vendor": p.get("vendor"),
-                "tags": p.get("tags", [])
-            })
+            yield parse_product(handle, p)
 
         # Pagination
         page_info = data.get("pageInfo", {})
         has_next = page_info.get("hasNextPage", False)
         cursor = page_info.get("endCursor")
 
-        print(f"[{handle}] Fetched {len(products)} products, total {len(all_products)}")
-        time.sleep(delay)
+def iter_new_products(handle, state, first=None, session=None):
+    """
+    Yield only products that earlier runs haven't seen, then advance the
+    collection's watermark. Newest-first handles stop paginating at the first
+    known product; any other handle is read in full and diffed by id.
+    """
+    newest_first = handle in NEWEST_FIRST_HANDLES
+    seen = set()
+    created = {}
+    for product in iter_collection(handle, first, session):
+        product_id = product["id"]
+        if newest_first and state.reached(product_id, product["createdAt"]):
+            print(f"[{handle}] Reached products from an earlier run, stopping")
+            break
+        seen.add(product_id)
+        if not state.is_known(product_id):
+            created[product_id] = product["createdAt"]
+            yield product
+    # Only reached once the caller has consumed the whole collection
+    state.update(seen, created, full=not newest_first)
+    state.save()
+    removed = f", {state.removed} no longer listed" if state.removed else ""
+    print(f"[{handle}] {len(created)} new products{removed}")
+
+def collection_products(handle, first=None, session=None, state_dir=None):
+    if state_dir:
+        return iter_new_products(handle, CollectionState(state_dir, handle), first, session)
+    return iter_collection(handle, first, session)
+
+def scrape_collection(handle, first=None, session=None, state_dir=None):
+    """Scrape all (or with `state_dir`, all new) products from a single collection handle."""
+    return list(collection_products(handle, first, session, state_dir))
+
+def save_collection(handle, products, suffix=""):
+    if "csv" in OUTPUT_FORMATS:
+        save_to_csv(products, f"{handle}-products{suffix}.csv")
+    if "parquet" in OUTPUT_FORMATS:
+        save_to_parquet(products, f"{handle}-products{suffix}.parquet")
 
-    return all_products
+def stream_collection(handle, writer, first=None, session=None, state_dir=None):
+    """Feed a collection straight into a MergedWriter; returns the number of products written."""
+    count = 0
+    for product in collection_products(handle, first, session, state_dir):
+        writer.write(product)
+        count += 1
+    return count
+
+def scrape_collections(handles, first=None, max_workers=MAX_WORKERS, writer=None, state_dir=None):
+    """
+    Crawl several collections in parallel over one pooled session. Each
+    collection is saved to its own files as soon as it finishes, or, with a
+    MergedWriter, streamed into the merged tables as pages arrive. With a
+    `state_dir` only products new since the last run are kept.
+    Returns {handle: product count}; failed handles are left out.
+    """
+    counts = {}
+    # Incremental runs add new files next to earlier ones instead of replacing them
+    suffix = time.strftime("-new-%Y%m%d-%H%M%S") if state_dir else ""
+    with make_session(pool_size=max_workers) as session, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        if writer:
+            futures = {
+                executor.submit(stream_collection, handle, writer, first, session, state_dir): handle
+                for handle in handles
+            }
+        else:
+            futures = {
+                executor.submit(scrape_collection, handle, first, session, state_dir): handle
+                for handle in handles
+            }
+        for future in as_completed(futures):
+            handle = futures[future]
+            try:
+                result = future.result()
+            except (requests.exceptions.RequestException, ValueError) as e:
+                print(f"❌ [{handle}] Failed: {e}")
+                continue
+            if writer:
+                counts[handle] = result
+            else:
+                save_collection(handle, result, suffix)
+                counts[handle] = len(result)
+    return counts
 
 def save_to_csv(products, filename="shopzetu_products.csv"):
     """Save product data to CSV. Variants & tags saved as JSON strings."""
@@ -82,9 +251,30 @@ def save_to_csv(products, filename="shopzetu_products.csv"):
 
     print(f"✅ Saved {len(products)} products to {filename}")
 
+def save_to_parquet(products, filename="shopzetu_products.parquet"):
+    """Save product data to Parquet with typed prices and a tags list column."""
+    from common.parquet_writer import ParquetWriter, SHOPZETU_PRODUCT_SCHEMA, shopzetu_product_row
+
+    if not products:
+        print("No products found.")
+        return
+
+    with ParquetWriter(filename, SHOPZETU_PRODUCT_SCHEMA, transform=shopzetu_product_row) as writer:
+        for p in products:
+            writer.write(p)
+
+    print(f"✅ Saved {len(products)} products to {filename}")
+
 if __name__ == "__main__":
     # 👇 Add any number of collection handles here
     collection_handles = ["new-arrivals","women","exclusively-men"]
-    for handle in collection_handles:
-        products = scrape_collection(handle, first=24, delay=1)
-        save_to_csv(products, f"{handle}-products.csv")
+    state_dir = STATE_DIR if INCREMENTAL else None
+    if MERGED_OUTPUT:
+        with MergedWriter(MERGED_DIR, append=INCREMENTAL) as writer:
+            counts = scrape_collections(collection_handles, writer=writer, state_dir=state_dir)
+        print(f"✅ Saved {writer.report()} to {MERGED_DIR}/")
+    else:
+        counts = scrape_collections(collection_handles, state_dir=state_dir)
+    print(f"Scraped {sum(counts.values())} products from {len(counts)}/{len(collection_handles)} collections")
+    print(f"Rate limiter: {RATE_LIMITER.report()}")
+    print(f"Page size: {PAGE_SIZER.report()}")